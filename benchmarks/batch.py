@@ -0,0 +1,49 @@
+"""
+Throughput benchmark of the batch simulator against the scalar SnakeSim, with random moves.
+Requires NumPy. Run it from the project root:
+
+    python -m benchmarks.batch
+"""
+
+from random import random, choice
+from time import perf_counter
+
+import numpy as np
+
+from source.engine.tools import Direction
+from source.game.batch import BatchSnakeSim
+from source.game.simulation import SnakeSim
+
+
+def scalar(ticks):
+    sim = SnakeSim()
+    directions = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+
+    start = perf_counter()
+    for _ in range(ticks):
+        if sim.step(choice(directions) if random() < 0.3 else None)[1]:
+            sim.reset()
+    return ticks / (perf_counter() - start)
+
+
+def batch(count, ticks):
+    sim = BatchSnakeSim(count, seed=0)
+    rng = np.random.default_rng(0)
+    actions = [np.where(rng.random(count) < 0.3, rng.integers(0, 4, count), -1) for _ in range(16)]
+
+    start = perf_counter()
+    for tick in range(ticks):
+        sim.step(actions[tick % 16])
+    return count * ticks / (perf_counter() - start)
+
+
+def main():
+    reference = scalar(50000)
+    print(f"SnakeSim:              {reference:12,.0f} steps/s")
+    for count in (1, 64, 1024, 8192):
+        steps = batch(count, max(100, 200000 // count))
+        print(f"BatchSnakeSim x{count:<6} {steps:12,.0f} steps/s  ({steps / reference:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
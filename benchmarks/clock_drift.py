@@ -0,0 +1,75 @@
+"""
+Drift of periodic timers over a million ticks.
+
+A Clock is driven by a fake nanosecond time source, which moves forward with jittered frame times, and a periodic Timer
+is polled in every frame, until it has fired a million times. A phase-locked timer has to fire exactly
+floor(elapsed / period) times, the old timer, which restarted its cycle at the time of the call, falls behind by the
+lateness of every call. The script fails (with a non-zero exit code) if the phase-locked timer or the fixed steps drift.
+Run it from the project root:
+
+    python -m benchmarks.clock_drift
+"""
+
+import sys
+from random import Random
+from time import perf_counter
+
+from source.engine.clock import Clock, Timer, FixedStep, MS
+
+
+class FakeTime:
+    """ Injectable time source of the Clock, in nanoseconds """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self) -> int:
+        return self.now
+
+
+class OldTimer(Timer):
+    """ Timer with the old behaviour: a new cycle started when the timer was called """
+
+    def __call__(self):
+        if self._running and self._clock.now_ns - self._period >= self._mark:
+            self._mark = self._clock.now_ns
+            self._running = self._periodic
+            return True
+        return False
+
+
+def run(timer_class, ticks, period=120, seed=0):
+    """ :returns: cycles fired by the timer (until it has fired `ticks` times), fixed steps, and the expected number """
+    rng = Random(seed)
+    time = FakeTime()
+    clock = Clock(60, time)
+    timer = timer_class(clock, period)
+    step = FixedStep(clock, period, max_steps=ticks)
+
+    fired = steps = 0
+    while fired < ticks:
+        time.now += rng.randrange(14 * MS, 20 * MS)  # 60 FPS with jitter
+        clock.update()
+        fired += timer()
+        steps += step()
+
+    return fired, steps, time.now // (period * MS)  # the clock started at 0
+
+
+def main():
+    ticks = 1_000_000
+    failed = False
+    for name, timer_class in (("phase-locked", Timer), ("old", OldTimer)):
+        start = perf_counter()
+        fired, steps, expected = run(timer_class, ticks)
+        print(f"{name:>12}: timer fired {fired} of {expected} cycles (drift: {expected - fired}), "
+              f"fixed steps: {steps} (drift: {expected - steps})  [{perf_counter() - start:.1f} s]")
+        failed |= expected != steps or (timer_class is Timer and expected != fired)
+
+    if failed:
+        print("FAILED: the phase-locked timer or the fixed steps drifted")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
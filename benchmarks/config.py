@@ -0,0 +1,48 @@
+"""
+Config snapshot benchmark.
+
+Compares the tile rectangles of a field computed from the LAYOUT attributes (as Field.tile_rect did before) with the
+precomputed corners and insets of the Config snapshot. Run it from the project root:
+
+    python -m benchmarks.config
+"""
+
+from time import perf_counter
+
+from source.engine.settings import LAYOUT
+from source.game.game_objects import Field
+
+
+def old_tile_rect(field, at, gap=1):
+    """ The old Field.tile_rect: looked up the layout values for every tile """
+    x, y = at
+    return (
+        x * LAYOUT.TILE + LAYOUT.GAP * gap + field.left,
+        y * LAYOUT.TILE + LAYOUT.GAP * gap + field.top,
+        (x + 1) * LAYOUT.TILE - LAYOUT.GAP * gap + field.left,
+        (y + 1) * LAYOUT.TILE - LAYOUT.GAP * gap + field.top,
+    )
+
+
+def time_tiles(tile_rect, field, frames):
+    """ :returns: time of the rectangles of every tile in a frame """
+    tiles = [at for _, at in field]
+    start = perf_counter()
+    for _ in range(frames):
+        for at in tiles:
+            tile_rect(at)
+    return (perf_counter() - start) / frames
+
+
+def main():
+    field = Field(LAYOUT.FIELD_POS, LAYOUT.FIELD_SIZE)
+    frames = 500
+    old = time_tiles(lambda at: old_tile_rect(field, at), field, frames)
+    new = time_tiles(field.tile_rect, field, frames)
+    assert all(old_tile_rect(field, at, gap) == field.tile_rect(at, gap) for _, at in field for gap in range(1, 5))
+    print(f"tile rects   attributes: {old * 1e6:8.1f} us/frame  snapshot: {new * 1e6:8.1f} us/frame  "
+          f"({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
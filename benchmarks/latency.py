@@ -0,0 +1,60 @@
+"""
+Input latency benchmark with synthetic input.
+
+Runs the game, and instead of a human at the keyboard, presses random direction keys at random intervals with
+tkinter's event_generate, restarting the game whenever it is over. The press to simulate and press to render latencies
+are recorded by the LatencyProbe of the Framework. Run it from the project root:
+
+    python -m benchmarks.latency
+"""
+
+from random import Random
+
+from source.engine.framework import Framework
+from source.engine.profiler import LatencyProbe
+from source.engine.settings import KEYS
+from source.game.game_states import States
+
+
+class SyntheticInput(Framework):
+    """ Framework driven by generated key events, which prints the latency statistics after the given presses """
+
+    def __init__(self, presses: int, seed: int = 0):
+        self.presses = presses
+        self.rng = Random(seed)
+        super().__init__()
+        self.after(100, self.press)
+
+    def press(self):
+        if self.current_state in (States.MENU, States.GAME_OVER):
+            self.current_state = States.START
+        elif self.current_state == States.START:
+            self.key(KEYS.UP)
+        elif self.current_state == States.GAME:
+            self.key(self.rng.choice((KEYS.UP, KEYS.DOWN, KEYS.LEFT, KEYS.RIGHT)))
+            self.presses -= 1
+
+        if self.presses > 0:
+            self.after(self.rng.randrange(30, 300), self.press)
+        else:
+            self.running = False
+
+    def key(self, code: int):
+        self.event_generate("<KeyPress>", keycode=code, when="tail")
+        self.event_generate("<KeyRelease>", keycode=code, when="tail")
+
+    def close(self):
+        for name in (LatencyProbe.SIMULATE, LatencyProbe.RENDER, "frame"):
+            stats = self.profiler.stats(name)
+            print(f"{name:>18}: p50 {stats['p50']:6.1f}  p95 {stats['p95']:6.1f}  p99 {stats['p99']:6.1f}"
+                  f"  max {stats['max']:6.1f} ms  ({stats['count']} samples)")
+        self.destroy()
+
+
+def main():
+    framework = SyntheticInput(presses=500)
+    framework.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Frame rate of the offscreen RasterDisplay, rendering headless games of the greedy bot without a display server.
+Run it from the project root:
+
+    python -m benchmarks.raster
+"""
+
+from time import perf_counter
+
+from source.engine.raster import RasterDisplay
+from source.engine.settings import LAYOUT, COLORS
+from source.game.farm import greedy
+from source.game.simulation import SnakeSim
+
+
+def run(size, frames, seed=0):
+    sim = SnakeSim(size, (0, 0), seed)
+    sim.reset(walls=False)
+    display = RasterDisplay(size[0] * LAYOUT.TILE, size[1] * LAYOUT.TILE, COLORS.BACKGROUND)
+
+    start = perf_counter()
+    for frame in range(frames):
+        if sim.game_over:
+            sim.reset(walls=False)
+        sim.step(greedy(sim))
+
+        display.begin_frame()
+        sim.field.render_background(display)
+        sim.field.render(display, sim.snake)
+        display.end_frame()
+    return (perf_counter() - start) / frames
+
+
+def main():
+    for size in ((20, 20), (40, 40), (80, 80)):
+        frame = run(size, 500)
+        print(f"{size[0]:>3}x{size[1]:<3}  {frame * 1000:6.3f} ms/frame  {1 / frame:8.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
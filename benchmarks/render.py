@@ -0,0 +1,107 @@
+"""
+Frame-time benchmark of the field rendering.
+
+Compares the retained-mode CanvasDisplay against the old immediate approach, which deleted every canvas item and created
+them again in each frame. Run it from the project root:
+
+    python -m benchmarks.render
+"""
+
+from time import perf_counter
+from tkinter import Tk, Canvas
+
+from source.engine.graphics import CanvasDisplay
+from source.engine.tools import Vector
+from source.game.game_objects import Field, Snake
+
+
+class ImmediateDisplay:
+    """ Display with the old behaviour: everything is deleted and created again in every frame """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+
+    def begin_frame(self):
+        self.canvas.delete("all")
+
+    def end_frame(self):
+        pass
+
+    def rectangle(self, owner, slot, rect, fill, outline, stipple="", layer=0):
+        self.canvas.create_rectangle(*rect, fill=fill, outline=outline, stipple=stipple)
+
+    def text(self, owner, slot, pos, text, fill, font, layer=0):
+        self.canvas.create_text(*pos, text=text, justify="center", fill=fill, font=font)
+
+    def hide(self, owner, slot):
+        pass
+
+    def keep(self, owner):
+        pass
+
+
+def serpentine(size):
+    """ :returns: a closed path visiting every tile of the field row by row """
+    width, height = size
+    path = [(0, 0)]
+    for y in range(height):
+        columns = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        path.extend((x, y) for x in columns)
+    path.extend((0, y) for y in range(height - 1, 0, -1))
+    return path
+
+
+def advance(field, snake, path, head):
+    """ Moves the snake to the next tile of the path """
+    head = (head + 1) % len(path)
+    snake.update(field)
+    field.mark(snake.position)
+    snake.position = Vector(path[head])
+    snake.heading = Vector(path[head]) - Vector(path[head - 1])
+    snake.place(field)
+    return head
+
+
+def run(display, size, frames, redraw_all=False):
+    """ :param redraw_all: draws every tile in every frame, not only the dirty ones (the immediate approach) """
+    field = Field((0, 0), size)
+    snake = Snake(field)
+    field.clear()
+    snake.body.clear()
+
+    path = serpentine(size)
+    snake.length = len(path) // 2
+    head = -1
+    for _ in range(snake.length):
+        head = advance(field, snake, path, head)
+
+    start = perf_counter()
+    for frame in range(frames):
+        head = advance(field, snake, path, head)
+
+        display.begin_frame()
+        if redraw_all:
+            field.invalidate()
+        field.render_background(display)
+        field.render(display, snake)
+        display.end_frame()
+        display.canvas.update_idletasks()
+    return (perf_counter() - start) / frames
+
+
+def main():
+    root = Tk()
+    root.withdraw()
+
+    for size in ((20, 20), (40, 40), (80, 80)):
+        frames = 50
+        immediate = run(ImmediateDisplay(Canvas(root)), size, frames, redraw_all=True)
+        retained = run(CanvasDisplay(Canvas(root)), size, frames)
+        print(f"{size[0]:>3}x{size[1]:<3}  immediate: {immediate * 1000:8.2f} ms/frame"
+              f"  retained: {retained * 1000:8.2f} ms/frame  ({immediate / retained:.1f}x)")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
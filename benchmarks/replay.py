@@ -0,0 +1,48 @@
+"""
+Size and playback speed of replays, recorded from games of the greedy bot. Run it from the project root:
+
+    python -m benchmarks.replay
+"""
+
+from random import Random
+from time import perf_counter
+
+from source.game.farm import greedy
+from source.game.replay import Replay, Player
+from source.game.simulation import SnakeSim
+
+
+def record(seed, size):
+    sim = SnakeSim(size)
+    replay = Replay.record(sim, seed, walls=False)
+    while not sim.game_over and sim.ticks < 10000:
+        sim.step(greedy(sim))
+    replay.finish(sim)
+    return replay
+
+
+def main():
+    replay = max((record(seed, (60, 60)) for seed in range(5)), key=lambda item: item.ticks)
+    data = replay.encode()
+    print(f"recorded {replay.ticks} ticks with {len(replay.inputs)} turns: {len(data)} bytes "
+          f"({len(data) * 10000 / replay.ticks / 1024:.2f} KB per 10k ticks)")
+
+    start = perf_counter()
+    loaded = Replay.decode(data)
+    print(f"decode: {(perf_counter() - start) * 1000:.2f} ms")
+
+    start = perf_counter()
+    player = Player(loaded)
+    player.end()
+    elapsed = perf_counter() - start
+    print(f"full playback: {elapsed * 1000:.1f} ms ({replay.ticks / elapsed:,.0f} ticks/s, keyframes built)")
+
+    ticks = Random(0).sample(range(replay.ticks), 100)
+    start = perf_counter()
+    for tick in ticks:
+        player.seek(tick)
+    print(f"seek with keyframes: {(perf_counter() - start) * 10:.2f} ms on average")
+
+
+if __name__ == "__main__":
+    main()
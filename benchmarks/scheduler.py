@@ -0,0 +1,63 @@
+"""
+Cost of many waiting timers per frame.
+
+Registers a number of timers with random periods (like blinking and expiring bonuses, or other timed entities), and
+steps a clock through a few seconds of 60 FPS frames, once polling every Timer in every frame, and once running a
+Scheduler, which only touches the due callbacks. Both have to fire the same number of times. Run it from the project
+root:
+
+    python -m benchmarks.scheduler
+"""
+
+from random import Random
+from time import perf_counter
+
+from source.engine.clock import SimClock, Scheduler, Timer
+
+FRAME = 1000 / 60  # ms
+
+
+def polled(count, frames, seed=0):
+    """ :returns: number of fired timers, and the time spent per frame """
+    rng = Random(seed)
+    clock = SimClock()
+    timers = [Timer(clock, rng.randrange(100, 5000)) for _ in range(count)]
+
+    fired = 0
+    start = perf_counter()
+    for _ in range(frames):
+        clock.advance(FRAME)
+        for timer in timers:
+            fired += timer()
+    return fired, (perf_counter() - start) / frames
+
+
+def scheduled(count, frames, seed=0):
+    """ :returns: number of fired callbacks, and the time spent per frame """
+    rng = Random(seed)
+    clock = SimClock()
+    scheduler = Scheduler(clock)
+    fired = []
+    for _ in range(count):
+        period = rng.randrange(100, 5000)
+        scheduler.after(period, lambda: fired.append(None), period)
+
+    start = perf_counter()
+    for _ in range(frames):
+        clock.advance(FRAME)
+        scheduler.run()
+    return len(fired), (perf_counter() - start) / frames
+
+
+def main():
+    frames = 600
+    for count in (10, 100, 1000, 10000):
+        fired_polled, polled_frame = polled(count, frames)
+        fired_scheduled, scheduled_frame = scheduled(count, frames)
+        assert fired_polled == fired_scheduled
+        print(f"{count:>6} timers  polled: {polled_frame * 1e6:9.1f} us/frame  "
+              f"scheduled: {scheduled_frame * 1e6:8.1f} us/frame  ({polled_frame / scheduled_frame:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Tick-time benchmark of the snake body.
+
+Compares the deque-based body of the Snake against the old approach, which aged the body by decrementing every
+positive cell of the Field in each tick. Run it from the project root:
+
+    python -m benchmarks.snake_body
+"""
+
+from time import perf_counter
+
+from source.engine.tools import Vector, Direction
+from source.game.game_objects import Field, Snake
+
+
+def sweep_tick(field, snake):
+    """ The old tick: the whole field is walked through to age the body """
+    for item, at in field:
+        if item > 0:
+            field[at] -= 1
+    snake.move(field)
+    snake.position.x %= field.size[0]
+    field[snake.position] = snake.length
+
+
+def deque_tick(field, snake):
+    snake.update(field)
+    snake.move(field)
+    snake.position.x %= field.size[0]
+    snake.place(field)
+
+
+def run(tick, size, ticks):
+    field = Field((0, 0), size)
+    snake = Snake(field)
+    field.clear()
+    snake.body.clear()
+
+    # the snake runs along the first row, wrapping around at the edges
+    snake.position = Vector(0, 0)
+    snake.direction = Direction.RIGHT
+    field[snake.position] = snake.length
+    snake.place(field)
+
+    start = perf_counter()
+    for _ in range(ticks):
+        tick(field, snake)
+    return (perf_counter() - start) / ticks
+
+
+def main():
+    for size, sweep_ticks in ((20, 1000), (200, 20), (2000, 2)):
+        sweep = run(sweep_tick, (size, size), sweep_ticks)
+        body = run(deque_tick, (size, size), 10000)
+        print(f"{size:>4}x{size:<4}  sweep: {sweep * 1e6:12.1f} us/tick"
+              f"  deque: {body * 1e6:8.2f} us/tick  ({sweep / body:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
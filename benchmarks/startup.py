@@ -0,0 +1,68 @@
+"""
+Startup time of the Framework.
+
+Every run starts a fresh interpreter, which measures from the start of the imports:
+- the import of the framework (and of everything it imports)
+- the first painted frame
+- the end of the startup, when every state can be entered
+for the eager and the fast startup (see Framework fast_start). The screen groups are built lazily in both, building
+every registered group on top of the startup is what the eager interface paid, so it is reported too.
+Run it from the project root:
+
+    python -m benchmarks.startup
+"""
+
+import json
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+
+RUNS = 5
+TARGET = 150  # ms to the first painted frame
+
+
+def child(fast_start: bool):
+    """ Runs in the fresh interpreter :returns: times in ms from the start of the imports """
+    start = perf_counter()
+    from source.engine.framework import Framework
+    imported = perf_counter()
+
+    framework = Framework(fast_start=fast_start)
+    while not framework.ready:
+        framework.update()
+    ready = perf_counter()
+
+    for name in framework.interface.registered():
+        framework.group(name)
+    groups = perf_counter() - ready
+
+    framework.destroy()
+    return {
+        "import": (imported - start) * 1000,
+        "first frame": (framework.first_frame - start) * 1000,
+        "ready": (ready - start) * 1000,
+        "every group": groups * 1000,
+    }
+
+
+def run(mode: str) -> dict:
+    """ :returns: median times of the runs in fresh interpreters """
+    runs = [json.loads(subprocess.run([sys.executable, "-m", "benchmarks.startup", mode], capture_output=True,
+                                      check=True, text=True).stdout) for _ in range(RUNS)]
+    return {key: median(times[key] for times in runs) for key in runs[0]}
+
+
+def main():
+    for mode in ("eager", "fast"):
+        times = run(mode)
+        print(f"{mode:>5}: import {times['import']:6.1f} ms  first frame {times['first frame']:6.1f} ms"
+              f" ({'under' if times['first frame'] < TARGET else 'over'} {TARGET} ms)  ready {times['ready']:6.1f} ms"
+              f"  every group {times['every group']:5.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(json.dumps(child(fast_start=sys.argv[1] == "fast")))
+    else:
+        main()
@@ -0,0 +1,98 @@
+"""
+Tcl call count of the text measurements in a frame.
+
+Replays the label updates of a game frame (score, statistics and bonus timer labels, a slider value label and a
+switch), once with the old behaviour, which measured the text on every update and every switch render, and once with
+the cached TextLabel. Run it from the project root:
+
+    python -m benchmarks.text
+"""
+
+from time import perf_counter
+from tkinter import Tk
+from tkinter.font import Font
+
+from source.engine.graphics import Display
+from source.engine.interface import Interface, WidgetGroup, TextLabel, Switch, TextMetrics
+from source.engine.settings import LAYOUT
+
+
+class NullDisplay(Display):
+    """ Display which draws nothing, so only the measurements are counted """
+
+    def begin_frame(self): pass
+    def end_frame(self): pass
+    def rectangle(self, *args, **kwargs): pass
+    def text(self, *args, **kwargs): pass
+    def hide(self, owner, slot): pass
+    def keep(self, owner): pass
+
+
+class Counter:
+    """ Wraps the Tcl call of a font, and counts the calls """
+
+    def __init__(self, font):
+        self.calls = 0
+        self._call = font._call
+        font._call = self
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self._call(*args)
+
+
+def old_update_text(label, text):
+    """ The old TextLabel.update_text: measured the text every time """
+    label.text = text
+    label.resize(label.font.measure(text), label.font.metrics("linespace"))
+
+
+def old_switch_render(switch, display):
+    """ The old Switch.render: measured both texts in every frame """
+    for text in (switch.text, switch.STATE_TEXT[switch.state]):
+        switch.font.measure(text)
+        switch.font.metrics("linespace")
+    switch.render(display)
+
+
+def run(update_text, switch_render, labels, switch, frames):
+    display = NullDisplay()
+    start = perf_counter()
+    for frame in range(frames):
+        score, timer, speed = frame // 10, round(5 - frame % 50 / 10, 1), 5
+        update_text(labels[0], str(score))
+        update_text(labels[1], str(score))
+        update_text(labels[2], str(frame // 100))
+        update_text(labels[3], timer)
+        update_text(labels[4], str(speed))
+        switch_render(switch, display)
+    return (perf_counter() - start) / frames
+
+
+def main():
+    root = Tk()
+    root.withdraw()
+    TextLabel.FONT = [Font(family=LAYOUT.FONT, size=size, weight="bold") for size in LAYOUT.FONT_SIZES]
+    counters = [Counter(font) for font in TextLabel.FONT]
+
+    group = WidgetGroup(Interface())
+    labels = [TextLabel(group, (0, 0), "#000000", "0", 1) for _ in range(5)]
+    switch = Switch(group, (0, 0), (("#000000", "#000000"), ("#000000", "#000000")), "Walls", 1)
+
+    frames = 1000
+    for name, update_text, switch_render in (
+            ("old", old_update_text, old_switch_render),
+            ("cached", TextLabel.update_text, lambda widget, display: widget.render(display)),
+    ):
+        TextLabel.METRICS = TextMetrics()
+        for counter in counters:
+            counter.calls = 0
+        frame = run(update_text, switch_render, labels, switch, frames)
+        calls = sum(counter.calls for counter in counters)
+        print(f"{name:>6}: {calls / frames:6.2f} Tcl calls/frame  {frame * 1e6:8.1f} us/frame")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from source.engine.framework import Framework
 
 
 def main():
-    framework = Framework()
+    framework = Framework(fast_start=True)
     framework.after(10, framework.set_app_window)
     framework.mainloop()
 
@@ -1,55 +1,261 @@
-from time import time
+from heapq import heappush, heappop
+from time import perf_counter_ns
+from typing import Callable
+
+
+NS = 1_000_000_000  # nanoseconds in a second
+MS = 1_000_000  # nanoseconds in a millisecond
 
 
 class Clock:
-    """ Clock class which handles loop timing and some other time related tasks """
+    """
+    Clock class which handles loop timing and some other time related tasks.
+    Time is kept in integer nanoseconds of a monotonic counter, now and dt are also available in seconds.
+    """
 
-    def __init__(self, fps: int):
+    def __init__(self, fps: int, timer: Callable[[], int] = perf_counter_ns):
+        """
+        Clock init
+        :param fps: target frame rate
+        :param timer: monotonic time source in nanoseconds, can be replaced with a fake one for testing
+        """
         self._fps = fps
+        self._timer = timer
         self._mark = 0
-        self.dt = 0
-        self.now = 0
+        self._origin = 0  # frames are scheduled on a fixed grid from here
+        self._frame = 0
+        self.dt_ns = 0
+        self.now_ns = 0
         self.update()
 
+    @property
+    def now(self) -> float:
+        return self.now_ns / NS
+
+    @property
+    def dt(self) -> float:
+        return self.dt_ns / NS
+
     def update(self):
-        self.now = time()
-        self.dt = self.now - self._mark
-        self._mark = self.now
+        self.now_ns = self._timer()
+        self.dt_ns = self.now_ns - self._mark
+        self._mark = self.now_ns
+
+        # frames are scheduled on a fixed grid, so the rounding of leftover() does not add up
+        self._frame += 1
+        if self._deadline() < self.now_ns:  # a whole frame behind, the lost time is not made up
+            self._origin, self._frame = self.now_ns, 1
+
+    def _deadline(self) -> int:
+        """ :returns: start of the next frame in ns """
+        return self._origin + self._frame * NS // self._fps
+
+    def resume(self):
+        """ Restarts the frame timing after the loop has been sleeping, so the sleep does not count as a long frame """
+        self._mark = self._origin = self._timer()
+        self._frame = 0
+
+    def leftover(self) -> int:
+        """ :returns: time remaining until the start of the next frame with self._fps [frame/seconds] in ms """
+        return max(round((self._deadline() - self._timer()) / MS), 0)
+
+
+class SimClock(Clock):
+    """ Clock for simulations, which does not follow the real time, and only moves forward when it is advanced """
+
+    def __init__(self):
+        super().__init__(0)
+
+    def update(self):
+        pass
+
+    def reset(self):
+        self.now_ns = self.dt_ns = 0
+
+    def advance(self, delay: float):
+        """ Moves the clock forward with the given delay in milliseconds """
+        self.dt_ns = round(delay * MS)
+        self.now_ns += self.dt_ns
+
+
+class FixedStep:
+    """
+    Fixed timestep scheduler. The elapsed time of the clock is collected in an accumulator, which is spent in steps of
+    exactly the same length, so the speed of the game does not depend on the frame rate or the load.
+    """
+
+    def __init__(self, clock: Clock, step: float, max_steps: int = 5):
+        """
+        FixedStep init
+        :param clock: clock object for time reference
+        :param step: length of a step in ms
+        :param max_steps: most steps in a single frame. If more are due, the rest of the time is dropped, so the game
+        slows down instead of trying to catch up forever
+        """
+        self._clock = clock
+        self._step = round(step * MS)
+        self.max_steps = max_steps
+        self.accumulator = 0  # in ns
+
+    def __call__(self) -> int:
+        """ Adds the time elapsed since the last frame :returns: number of steps to be simulated in this frame """
+        self.accumulator += self._clock.dt_ns
+        steps = min(self.accumulator // self._step, self.max_steps)
+        self.accumulator -= steps * self._step
+        if self.accumulator >= self._step:
+            self.accumulator %= self._step
+        return steps
+
+    def time(self, behind: int = 0) -> float:
+        """ :returns: time of the step in seconds, which is `behind` steps before the last step due in this frame """
+        return (self._clock.now_ns - self.accumulator - behind * self._step) / NS
+
+    @property
+    def alpha(self) -> float:
+        """ :returns: progress towards the next step from 0 to 1, for interpolation in rendering """
+        return self.accumulator / self._step
+
+    def reset(self):
+        """ Drops the accumulated time, the next step is due after a whole step from now """
+        self.accumulator = 0
+
+    def set(self, step: float):
+        """ Sets a new step length in ms """
+        self._step = round(step * MS)
+
+
+class Scheduled:
+    """ Handle of a callback registered in a Scheduler """
+
+    __slots__ = ("_scheduler", "deadline", "period", "callback", "cancelled")
+
+    def __init__(self, scheduler: "Scheduler", deadline: int, period: (int, None), callback: Callable):
+        self._scheduler = scheduler
+        self.deadline = deadline
+        self.period = period
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self) -> float:
+        """ :returns: time until the callback is due in seconds, or 0 if it is cancelled or done """
+        return 0.0 if self.cancelled else max(self.deadline - self._scheduler.now_ns, 0) / NS
+
+
+class Scheduler:
+    """
+    Priority queue (heap) of timed callbacks on a clock. Only the due callbacks are touched in run(), so waiting timers
+    cost nothing. Periodic callbacks are phase-locked like Timer.
+    The scheduler has its own time, which can be paused (stopping every callback at once) or frozen for a frame.
+    """
+
+    def __init__(self, clock: Clock):
+        self._clock = clock
+        self._queue = []  # (deadline, number of scheduling, Scheduled)
+        self._count = 0
+        self._offset = 0  # ns the time of the scheduler is behind the clock
+        self._paused = None  # clock time of pausing
+
+    @property
+    def now_ns(self) -> int:
+        return (self._clock.now_ns if self._paused is None else self._paused) - self._offset
+
+    def after(self, delay: float, callback: Callable, period: float = None) -> Scheduled:
+        """
+        Registers a callback
+        :param delay: time until the callback is due in ms
+        :param callback: called without arguments by run()
+        :param period: if given, the callback is due again in every period [ms] until it is cancelled
+        :returns: handle of the callback
+        """
+        item = Scheduled(self, self.now_ns + round(delay * MS), None if period is None else round(period * MS),
+                         callback)
+        self._push(item)
+        return item
+
+    def _push(self, item: Scheduled):
+        self._count += 1
+        heappush(self._queue, (item.deadline, self._count, item))
+
+    def run(self) -> int:
+        """ Calls the due callbacks in the order of their deadlines :returns: number of the calls """
+        queue, now, calls = self._queue, self.now_ns, 0
+        while queue and queue[0][0] <= now:
+            item = heappop(queue)[2]
+            if item.cancelled:
+                continue
+            if item.period:
+                item.deadline += item.period * ((now - item.deadline) // item.period + 1)  # missed cycles are skipped
+                self._push(item)
+            else:
+                item.cancelled = True
+            item.callback()
+            calls += 1
+        return calls
+
+    def next_due(self) -> (float, None):
+        """ :returns: time until the next callback is due in seconds, or None if there is none (or it is paused) """
+        queue = self._queue
+        while queue and queue[0][2].cancelled:
+            heappop(queue)
+        if queue and self._paused is None:
+            return max(queue[0][0] - self.now_ns, 0) / NS
+
+    def pause(self):
+        if self._paused is None:
+            self._paused = self._clock.now_ns
+
+    def resume(self):
+        if self._paused is not None:
+            self._offset += self._clock.now_ns - self._paused
+            self._paused = None
+
+    def freeze(self):
+        """ Skips the last frame of the clock for every callback, like Timer.freeze """
+        self._offset += self._clock.dt_ns
 
-    def leftover(self) -> float:
-        """ :returns: time remaining until the current loop is ended with self._fps [frame/seconds] """
-        return max(int((1 / self._fps - (time() - self._mark)) * 1000), 0)
+    def clear(self):
+        """ Drops every callback, and restarts the time of the scheduler from the clock """
+        self._queue.clear()
+        self._offset = 0
+        self._paused = None
 
 
 class Timer:
-    """ Timer class which gives a signal when a specified time have been passed """
+    """
+    Timer class which gives a signal when a specified time have been passed.
+    Periodic timers are phase-locked: a new cycle starts when the last one was due, not when the timer was called, so
+    the lateness of the calls does not add up.
+    """
 
     def __init__(self, clock: Clock, period: int, periodic: bool = True, running: bool = True):
         """
         Timer init
         :param clock: clock object for time reference
-        :param period:
+        :param period: in ms
         :param periodic: if set to True, the timer automatically restarts when its expired
         :param running: enable signal. If set to False, the timer is stopped
         """
         self._clock = clock
-        self._period = period / 1000
-        self._mark = clock.now
+        self._period = round(period * MS)
+        self._mark = clock.now_ns
         self._periodic = periodic
         self._running = running
 
     def __call__(self):
-        """ :returns: True if the timer is expired (once per timer cycle) """
+        """ :returns: True if the timer is expired (once per call, cycles missed in between are skipped) """
 
-        if self._running and self._clock.now - self._period >= self._mark:
-            self._mark = self._clock.now
+        if self._running and (elapsed := self._clock.now_ns - self._mark) >= self._period:
+            self._mark += elapsed - elapsed % self._period if self._period else elapsed
             self._running = self._periodic
             return True
         else:
             return False
 
     def start(self):
-        self._mark = self._clock.now
+        self._mark = self._clock.now_ns
         self._running = True
 
     def stop(self):
@@ -57,12 +263,12 @@ class Timer:
 
     def freeze(self):
         """ Freezes the timer, skipping the game cycle when it is called in """
-        self._mark += self._clock.dt
+        self._mark += self._clock.dt_ns
 
     def set(self, delay):
-        """ Sets a new period to the timer """
-        self._period = delay / 1000
+        """ Sets a new period to the timer in ms """
+        self._period = round(delay * MS)
 
     def countdown(self) -> float:
         """ :returns: remaining time in seconds, or 0 if the timer is expired """
-        return (self._mark - (self._clock.now - self._period)) * self._running
+        return (self._mark + self._period - self._clock.now_ns) / NS * self._running
@@ -1,11 +1,32 @@
+from collections import deque
+from time import perf_counter
+from typing import Callable, List, NamedTuple
+
 from source.engine.tools import Vector
 
 
+class InputEvent(NamedTuple):
+    time: float
+    kind: str  # "press" or "release"
+    code: int
+
+
 class EventHandler:
 
-    """ Event handler wrapper for tkinter """
+    """
+    Event handler wrapper for tkinter.
+    Besides the pressed and held key sets of the current frame, key events are also stored in arrival order with their
+    time in a ring buffer, so they can be consumed at the exact time they are needed (see pop).
+    """
 
-    def __init__(self, framework):
+    QUEUE_SIZE = 64
+
+    def __init__(self, framework, on_input: Callable = None):
+        """
+        EventHandler init
+        :param framework: tkinter window to bind the events to
+        :param on_input: called on every input event, to wake up a sleeping loop
+        """
 
         framework.bind("<Key>", self.key_press)
         framework.bind("<KeyRelease>", self.key_release)
@@ -19,29 +40,61 @@ class EventHandler:
         self.hold = [0, 0, 0]
 
         self.focus = Vector()
+        self.queue = deque(maxlen=self.QUEUE_SIZE)
+
+        self.on_input = on_input
+        self.received = False
+        self.moved = False
 
     def clear(self):
         self._key_press.clear()
         self.click = [0, 0, 0]
+        self.received = False
+        self.moved = False
+
+    def pop(self, until: float) -> List[InputEvent]:
+        """ Removes the queued events which arrived before the given time :returns: them in arrival order """
+        events = []
+        while self.queue and self.queue[0].time <= until:
+            events.append(self.queue.popleft())
+        return events
+
+    def flush(self):
+        """ Drops the queued events """
+        self.queue.clear()
+
+    def input(self):
+        """ Marks that an input has arrived since the last frame """
+        self.received = True
+        if self.on_input is not None:
+            self.on_input()
 
     def key_press(self, event):
         # print(f"{event.keysym} - {event.keycode}")
+        self.input()
+        self.queue.append(InputEvent(perf_counter(), "press", event.keycode))
         self._key_hold.add(event.keycode)
         self._key_press.add(event.keycode)
 
     def key_release(self, event):
+        self.input()
+        self.queue.append(InputEvent(perf_counter(), "release", event.keycode))
         if event.keycode in self._key_hold:
             self._key_hold.remove(event.keycode)
 
     def mouse_press(self, event):
+        self.input()
         self.click[event.num-1] = 1
         self.hold[event.num-1] = 1
 
     def mouse_release(self, event):
+        self.input()
         if event.num in self.hold:
             self.hold[event.num-1] = 0
 
     def mouse_motion(self, event):
+        self.input()
+        self.moved = True
         self.focus = Vector(event.x, event.y)
 
     def __getitem__(self, key_mode):
@@ -1,20 +1,24 @@
 from ctypes import windll
+from time import perf_counter
 from tkinter import Tk, Canvas, BOTH
 from tkinter.font import Font
 
 from win32gui import GetForegroundWindow, ShowWindow
 from win32con import SW_MINIMIZE
 
-from source.engine.clock import Clock, Timer
+from source.engine.clock import Clock, FixedStep, Scheduler
 from source.engine.events import EventHandler
+from source.engine.graphics import CanvasDisplay
 from source.engine.interface import (
     Interface, WidgetGroup, Button, WindowHeader, HeaderButton, TextLabel, Switch, StatLabel, LabeledSlider,
-    KeyConfigSwitch
+    KeyConfigSwitch, ProfilerOverlay
 )
-from source.engine.settings import SETTINGS, COLORS, LAYOUT, KEYS
+from source.engine.profiler import Profiler, LatencyProbe
+from source.engine.settings import SETTINGS, COLORS, LAYOUT, KEYS, PATH, WRITER
 from source.engine.state_machine import StateMachine
 from source.engine.tools import Vector
-from source.game.game_objects import Field, Snake, Apple, Bonus
+from source.game.replay import Replay
+from source.game.simulation import SnakeSim
 from source.game.game_states import (
     Intro, Menu, Start, Game, GameOver, NewHighScore, Paused, Settings, KeyConfig, Leaderboard, Outro
 )
@@ -25,12 +29,14 @@ class Framework(Tk, StateMachine):
     APP_WINDOW = 0x00040000
     TOOL_WINDOW = 0x00000080
 
-    def __init__(self):
+    def __init__(self, fast_start: bool = False):
+        """
+        Framework init
+        :param fast_start: shows the window in the Intro state first, and runs the rest of the startup (fonts,
+        interface and states) in idle callbacks, after the first frame has been painted
+        """
 
         Tk.__init__(self)
-        TextLabel.FONT = [Font(family=LAYOUT.FONT, size=size, weight="bold") for size in LAYOUT.FONT_SIZES]
-        fancy_font = Font(family=LAYOUT.FANCY_FONT, size=LAYOUT.FONT_SIZES[-1], slant="italic", underline=True)
-        TextLabel.FONT.append(fancy_font)
 
         self.resizable(False, False)
         self.geometry(f"{LAYOUT.WIDTH}x{LAYOUT.HEIGHT}")
@@ -38,10 +44,18 @@ class Framework(Tk, StateMachine):
         self.overrideredirect(True)
 
         self.running, self.paused = True, False
+        self.sleeping, self.redraw = False, True
+        self._alarm = None
+        self.ready = False
+        self._on_ready = []
+        self.first_frame = None  # perf_counter time of the first painted frame
 
         self.clock = Clock(SETTINGS.FPS)
-        self.event_handler = EventHandler(self)
-        self.display = Canvas(
+        self.profiler = Profiler(SETTINGS.FPS)
+        self.latency = LatencyProbe(self.profiler)
+        self.show_profiler = False
+        self.event_handler = EventHandler(self, self.wake)
+        self.canvas = Canvas(
             self,
             width=LAYOUT.WIDTH,
             height=LAYOUT.HEIGHT,
@@ -49,25 +63,65 @@ class Framework(Tk, StateMachine):
             highlightthickness=0,
             bd=0,
         )
-        self.display.pack(fill=BOTH, expand=True)
+        self.canvas.pack(fill=BOTH, expand=True)
+        self.display = CanvasDisplay(self.canvas)
 
-        self.loop_timer = Timer(self.clock, SETTINGS.STARTING_SPEED)
-        self.state_timer = Timer(self.clock, 0, periodic=False, running=False)
+        self.scheduler = Scheduler(self.clock)
 
-        self.score = 0
-        self.speed = SETTINGS.STARTING_SPEED
-        self.walls = SETTINGS.WALLS
+        self.sim = SnakeSim()
+        self.replay = None
+        self.game_step = FixedStep(self.clock, self.sim.delay)
+        self.step_time = 0
 
-        self.field = Field(LAYOUT.FIELD_POS, LAYOUT.FIELD_SIZE)
-        self.snake = Snake(self.field)
-        self.apple = Apple()
-        self.apple.repos(self.field)
-        self.bonus = Bonus(0, self.clock)
-        self.bonus.update_lifetime(self.snake.delays[self.speed])
-
-        # --- INTERFACE ---------------------------------------------------------------------------------------------- #
         self.interface = Interface()
+        self.triggers = {}
+        self.key_names = {}
+        self.map_keys()
+        KEYS.bind(None, lambda *_: self.map_keys())
+
+        StateMachine.__init__(self, Intro(self))
+
+        startup = [self.load_fonts, self.build_interface, self.add_states]
+        if fast_start:
+            self.loop()
+            self.after_idle(self.start_up, startup)
+        else:
+            for step in startup:
+                step()
+            self.started()
+            self.loop()
+
+    # === [ STARTUP ] ================================================================================================ #
+
+    def start_up(self, steps: list):
+        """ Runs the next step of the startup, and continues with the rest in an idle callback (see fast_start) """
+        steps.pop(0)()
+        if steps:
+            self.after_idle(self.start_up, steps)
+        else:
+            self.started()
+
+    def started(self):
+        self.ready = True
+        for callback in self._on_ready:
+            callback()
+        self._on_ready.clear()
+        self.invalidate()
+        self.wake()
+
+    def when_ready(self, callback):
+        """ Calls the callback when the startup has finished, immediately if it already has """
+        if self.ready:
+            callback()
+        else:
+            self._on_ready.append(callback)
+
+    def load_fonts(self):
+        TextLabel.FONT = [Font(family=LAYOUT.FONT, size=size, weight="bold") for size in LAYOUT.FONT_SIZES]
+        fancy_font = Font(family=LAYOUT.FANCY_FONT, size=LAYOUT.FONT_SIZES[-1], slant="italic", underline=True)
+        TextLabel.FONT.append(fancy_font)
 
+    def build_interface(self):
         # header #
         self.header_group = WidgetGroup(self.interface, "Header", active=True)
         self.header = WindowHeader(self.header_group, self)
@@ -86,10 +140,10 @@ class Framework(Tk, StateMachine):
                                            "midright")
         self.speed_label = TextLabel(self.panel_group, LAYOUT.SPEED_LABEL, COLORS.WHITE_LABEL, "Speed: ", 1, "midleft")
         self.speed_value_label = TextLabel(self.panel_group, LAYOUT.SPEED_VALUE_LABEL, COLORS.RED_LABEL,
-                                           str(self.speed), 1, "midright")
+                                           str(self.sim.speed), 1, "midright")
         self.walls_label = TextLabel(self.panel_group, LAYOUT.WALLS_LABEL, COLORS.WHITE_LABEL, "Walls: ", 1, "midleft")
         self.walls_value_label = TextLabel(self.panel_group, LAYOUT.WALLS_VALUE_LABEL, COLORS.RED_LABEL,
-                                           "ON" if self.walls else "OFF", 1, "midright")
+                                           "ON" if self.sim.walls else "OFF", 1, "midright")
         self.stat_label = TextLabel(self.panel_group, LAYOUT.STAT_LABEL, COLORS.GREEN_LABEL, "Statistics", 2)
         self.apple_stat_label = StatLabel(self.panel_group, LAYOUT.APPLE_STAT, 170, [COLORS.RED_LABEL, COLORS.APPLE])
         self.bonus_stat_label = StatLabel(self.panel_group, LAYOUT.BONUS_STAT, 170, [COLORS.RED_LABEL, COLORS.BONUS[0]])
@@ -97,21 +151,76 @@ class Framework(Tk, StateMachine):
         self.bonus_label = TextLabel(self.bonus_group, LAYOUT.BONUS_LABEL, COLORS.BLUE_LABEL, "Bonus", 3)
         self.bonus_timer_label = TextLabel(self.bonus_group, LAYOUT.BONUS_TIMER_LABEL, COLORS.BLUE_LABEL, "0", 2)
 
-        # menu #
+        # the groups of the screens are built when their state is entered first
+        for name, builder in (
+                ("Menu", self.build_menu),
+                ("Start", self.build_start),
+                ("Resume", self.build_resume),
+                ("Settings", self.build_settings),
+                ("Key config", self.build_key_config),
+                ("High scores", self.build_high_scores),
+                ("Start game", self.build_start_game),
+                ("Game over", self.build_game_over),
+                ("Profiler", self.build_profiler_overlay),
+        ):
+            self.interface.register(name, builder)
+
+        # buttons dispatch their attribute names as triggers of the state transitions
+        self.collect_triggers()
+
+    def add_states(self):
+        self.add_state(
+            Menu(self),
+            Start(self),
+            Game(self),
+            GameOver(self),
+            NewHighScore(self),
+            Paused(self),
+            Settings(self),
+            KeyConfig(self),
+            Leaderboard(self),
+            Outro(self),
+        )
+
+    # === [ WIDGET GROUP BUILDERS ] ================================================================================== #
+
+    def group(self, name: str) -> WidgetGroup:
+        """ :returns: the widget group of the interface, it is built at the first call (see Interface.register) """
+        if not self.interface.built(name):
+            group = self.interface.group(name)
+            self.collect_triggers()
+            return group
+        return self.interface.group(name)
+
+    def map_keys(self):
+        """ Maps the key codes to their names in KEYS, which are dispatched to the state machine when pressed """
+        self.key_names = {getattr(KEYS, name): name for name, _ in KEYS if name != "DEFAULT"}
+
+    def collect_triggers(self):
+        """ Maps the buttons to their attribute names, which are dispatched to the state machine when clicked """
+        self.triggers = {widget: name for name, widget in vars(self).items() if isinstance(widget, Button)}
+
+    def build_menu(self) -> WidgetGroup:
         self.menu_group = WidgetGroup(self.interface, "Menu")
-        self.start_group = WidgetGroup(self.interface, "Start")
-        self.resume_group = WidgetGroup(self.interface, "Resume")
+        self.settings_button = Button(self.menu_group, LAYOUT.SETTINGS_BUTTON, COLORS.WHITE_BUTTON, "Settings")
+        self.key_config_button = Button(self.menu_group, LAYOUT.KEY_CONFIG_BUTTON, COLORS.WHITE_BUTTON, "Key config")
+        self.high_scores_button = Button(self.menu_group, LAYOUT.HIGH_SCORES_BUTTON, COLORS.WHITE_BUTTON, "Leaderboard")
+        self.exit_button = Button(self.menu_group, LAYOUT.EXIT_BUTTON, COLORS.RED_BUTTON, "Exit")
+        return self.menu_group
 
+    def build_start(self) -> WidgetGroup:
+        self.start_group = WidgetGroup(self.interface, "Start")
         self.start_button = Button(self.start_group, LAYOUT.START_BUTTON, COLORS.GREEN_BUTTON, "Play", 3)
+        return self.start_group
+
+    def build_resume(self) -> WidgetGroup:
+        self.resume_group = WidgetGroup(self.interface, "Resume")
         self.continue_button = Button(self.resume_group, LAYOUT.RESUME_BUTTON, COLORS.GREEN_BUTTON, "Continue")
         self.restart_button = Button(self.resume_group, LAYOUT.RESTART_BUTTON, COLORS.GREEN_BUTTON, "Restart")
         self.paused_label = TextLabel(self.resume_group, LAYOUT.PAUSED_LABEL, COLORS.GREEN_LABEL, "Paused", 3)
-        self.settings_button = Button(self.menu_group, LAYOUT.SETTINGS_BUTTON, COLORS.WHITE_BUTTON, "Settings")
-        self.key_config_button = Button(self.menu_group, LAYOUT.KEY_CONFIG_BUTTON, COLORS.WHITE_BUTTON, "Key config")
-        self.high_scores_button = Button(self.menu_group, LAYOUT.HIGH_SCORES_BUTTON, COLORS.WHITE_BUTTON, "Leaderboard")
-        self.exit_button = Button(self.menu_group, LAYOUT.EXIT_BUTTON, COLORS.RED_BUTTON, "Exit")
+        return self.resume_group
 
-        # settings #
+    def build_settings(self) -> WidgetGroup:
         self.settings_group = WidgetGroup(self.interface, "Settings")
         self.wall_switch = Switch(self.settings_group, LAYOUT.WALL_SWITCH, COLORS.GREEN_SWITCH, "Walls", 1,
                                   state=SETTINGS.WALLS, align="center")
@@ -122,88 +231,98 @@ class Framework(Tk, StateMachine):
             self.settings_group, LAYOUT.STARTING_SPEED_SLIDER, LAYOUT.SLIDER_LENGTH, COLORS.GREEN_SLIDER, "Speed:",
             SETTINGS.STARTING_SPEED, SETTINGS.SPEED_MAPPING[:2]
         )
+        return self.settings_group
 
-        # key config #
+    def build_key_config(self) -> WidgetGroup:
         self.key_config_group = WidgetGroup(self.interface, "Key config")
         self.key_config_return_button = Button(self.key_config_group, LAYOUT.KEY_CONFIG_RETURN_BUTTON,
                                                COLORS.RED_BUTTON, "Back")
         self.reset_keys_button = Button(self.key_config_group, LAYOUT.RESET_KEYS_BUTTON, COLORS.WHITE_BUTTON, "Default")
 
         self.key_config_switches = {}
-        for row, (name, key) in enumerate(KEYS):
-            if name == "DEFAULT":
-                continue
+        for row, name in enumerate(name for name, _ in KEYS if name != "DEFAULT"):
             switch_pos = Vector(LAYOUT.KEY_CONFIG_SWITCHES) + Vector(0, LAYOUT.KEY_CONFIG_LINE_SPACE * row)
             label_pos = Vector(LAYOUT.KEY_CONFIG_LABELS) + Vector(0, LAYOUT.KEY_CONFIG_LINE_SPACE * row)
-            switch = KeyConfigSwitch(self.key_config_group, switch_pos, COLORS.GREEN_BUTTON, key)
+            switch = KeyConfigSwitch(self.key_config_group, switch_pos, COLORS.GREEN_BUTTON, getattr(KEYS, name))
             TextLabel(self.key_config_group, label_pos, COLORS.WHITE_LABEL, name.capitalize() + ":", 1, "midleft")
             self.key_config_switches[name] = switch
+        return self.key_config_group
 
-        # high scores #
+    def build_high_scores(self) -> WidgetGroup:
         self.high_scores_group = WidgetGroup(self.interface, "High scores")
         self.high_scores_return_button = Button(self.high_scores_group, LAYOUT.HIGH_SCORES_RETURN_BUTTON,
                                                 COLORS.RED_BUTTON, "Back")
+        return self.high_scores_group
 
-        # start #
+    def build_start_game(self) -> WidgetGroup:
         self.start_game_group = WidgetGroup(self.interface, "Start game")
         self.start_game_label = TextLabel(self.start_game_group, LAYOUT.START_GAME_LABEL, COLORS.WHITE_LABEL,
                                           "Press any key to start")
+        return self.start_game_group
 
-        # game over #
-        self.game_over_group = WidgetGroup(self.interface, "Start game")
+    def build_game_over(self) -> WidgetGroup:
+        self.game_over_group = WidgetGroup(self.interface, "Game over")
         self.game_over_label = TextLabel(self.game_over_group, LAYOUT.GAME_OVER_LABEL, COLORS.RED_LABEL, "Game over", 3)
         self.game_over_menu_button = Button(self.game_over_group, LAYOUT.GAME_OVER_MENU_BUTTON, COLORS.WHITE_BUTTON,
                                             "Menu")
         self.game_over_restart_button = Button(self.game_over_group, LAYOUT.GAME_OVER_RESTART_BUTTON,
                                                COLORS.GREEN_BUTTON, "Play again")
+        return self.game_over_group
 
-        # --- STATE MACHINE ------------------------------------------------------------------------------------------ #
-
-        StateMachine.__init__(self, Intro(self))
-
-        self.add_state(
-            Menu(self),
-            Start(self),
-            Game(self),
-            GameOver(self),
-            NewHighScore(self),
-            Paused(self),
-            Settings(self),
-            KeyConfig(self),
-            Leaderboard(self),
-            Outro(self),
-        )
+    def build_profiler_overlay(self) -> WidgetGroup:
+        self.profiler_overlay = ProfilerOverlay(self.interface, LAYOUT.PROFILER_OVERLAY, COLORS.WHITE_LABEL,
+                                                self.profiler)
+        return self.profiler_overlay
 
-        self.loop()
+    # === [ FRAMEWORK ] ============================================================================================== #
 
     def reset(self):
-        self.field.clear()
-        self.snake.reset(self.field)
-        self.apple.repos(self.field)
-        self.score = 0
-        self.walls = SETTINGS.WALLS
-        self.speed = SETTINGS.STARTING_SPEED
-
-        self.loop_timer.set(self.snake.delays[self.speed])
-        self.bonus.update_lifetime(self.snake.delays[self.speed])
-        self.bonus.deactivate(self)
-
-        self.score_value_label.update_text(self.score)
-        self.speed_value_label.update_text(self.speed)
-        self.walls_value_label.update_text("ON" if self.walls else "OFF")
-        self.apple_stat_label.update_text(str(self.snake.stats["apple"]))
-        self.bonus_stat_label.update_text(str(self.snake.stats["bonus"]))
+        self.replay = Replay.record(self.sim, self.sim.rng.getrandbits(32))
+        self.game_step.set(self.sim.delay)
+        self.interface.deactivate(self.bonus_group)
+
+        self.score_value_label.update_text(self.sim.score)
+        self.speed_value_label.update_text(self.sim.speed)
+        self.walls_value_label.update_text("ON" if self.sim.walls else "OFF")
+        self.apple_stat_label.update_text(str(self.sim.snake.stats["apple"]))
+        self.bonus_stat_label.update_text(str(self.sim.snake.stats["bonus"]))
 
     def close(self):
         SETTINGS.save()
         KEYS.save()
+        WRITER.flush()
+        if self.show_profiler:
+            self.profiler.dump(PATH.PROFILE)
         self.destroy()
 
+    def dispatch(self, trigger):
+        """ The profiler key toggles the overlay in every state, the other triggers are queued for the states """
+        if trigger != "PROFILER":
+            super().dispatch(trigger)
+            return
+
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler:
+            self.interface.activate(self.group("Profiler"))
+        else:
+            self.interface.deactivate(self.group("Profiler"))
+
     def events(self):
+        if not self.ready:
+            return  # the interface is still being built (see fast_start)
 
         self.interface.events(self.event_handler)
         self.state_events(self.event_handler)
 
+        for widget in self.interface.clicked:
+            if widget in self.triggers:
+                self.dispatch(self.triggers[widget])
+        if pressed := self.event_handler["any", "press"]:
+            for code in pressed:
+                if code in self.key_names:
+                    self.dispatch(self.key_names[code])
+            self.dispatch("any key")
+
         if self.close_button.pressed:
             self.running = False
 
@@ -211,31 +330,86 @@ class Framework(Tk, StateMachine):
             minimize = GetForegroundWindow()
             ShowWindow(minimize, SW_MINIMIZE)
 
+
     def logic(self):
-        if self.loop_timer():
+        steps = self.game_step()
+        for step in range(steps):
+            self.step_time = self.game_step.time(steps - 1 - step)
             self.state_logic()
 
+    @property
+    def alpha(self) -> float:
+        """ :returns: progress of the game between the last and the next logic step, from 0 to 1 """
+        return self.game_step.alpha
+
     def render(self):
-        self.display.delete("all")
-        self.field.render_background(self.display)
+        self.display.begin_frame()
+        self.sim.field.render_background(self.display)
         self.state_render(self.display)
         self.interface.render(self.display)
+        self.display.end_frame()
+        self.latency.rendered()
+        if self.first_frame is None:
+            self.update_idletasks()  # paints the window
+            self.first_frame = perf_counter()
+
+    def invalidate(self):
+        """ Marks the frame to be rendered, even if there was no input and the state did not change """
+        self.redraw = True
+
+    def wake(self):
+        """ Continues a sleeping loop, on input or when the next deadline of the state is reached """
+        if self.sleeping:
+            self.sleeping = False
+            if self._alarm is not None:
+                self.after_cancel(self._alarm)
+                self._alarm = None
+            self.clock.resume()
+            self.after_idle(self.loop)
+
+    def sleep(self, wake_in: (float, None)):
+        """ Stops the loop until the next input event, or until the given time in seconds has passed """
+        self.sleeping = True
+        self._alarm = None
+        if wake_in is not None:
+            self._alarm = self.after(max(round(wake_in * 1000), 1), self.wake)
+
+    def wake_in(self) -> (float, None):
+        """ :returns: time until the current state or a scheduled callback needs a frame in seconds, or None """
+        wake_in, due = self.state_wake_in(), self.scheduler.next_due()
+        if wake_in is None or due is None:
+            return due if wake_in is None else wake_in
+        return min(wake_in, due)
 
     def loop(self):
         self.clock.update()
-        self.update_states()
-
-        self.events()
-        if not self.paused:
-            self.logic()
-        self.render()
+        self.profiler.frame(self.clock.dt)
+        state = self.current_state
+
+        with self.profiler.measure("events"):
+            self.scheduler.run()
+            self.update_states()
+            self.events()
+        with self.profiler.measure("logic"):
+            if not self.paused:
+                self.logic()
+
+        # states which only change on input are rendered after input or a transition, then the loop goes to sleep
+        ticking = (wake_in := self.wake_in()) == 0
+        rendered = ticking or self.redraw or self.event_handler.received or self.current_state != state
+        if rendered:
+            with self.profiler.measure("render"):
+                self.render()
+            self.redraw = False
 
         self.event_handler.clear()
 
-        if self.running:
+        if not self.running:
+            self.close()
+        elif rendered:
             self.after(self.clock.leftover(), self.loop)
         else:
-            self.close()
+            self.sleep(wake_in)
 
     def set_app_window(self):
         hwnd = windll.user32.GetParent(self.winfo_id())
@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+from typing import Hashable, Tuple
+
+
+class Layer:
+    """ Stacking order of the canvas items, from bottom to top """
+    BACKGROUND = 0
+    FIELD = 1
+    DETAIL = 2
+    OVERLAY = 3
+    INTERFACE = 4
+
+
+class Display(ABC):
+
+    """
+    Drawing protocol of the game objects and widgets, which every render backend implements.
+
+    Items are addressed by an (owner, slot) pair, and they stay on the display between frames. An item is created the
+    first time it is drawn, and updated when it is drawn again. Owners which are not drawn (or kept) during a frame are
+    hidden at the end of the frame, and shown again when they are drawn the next time.
+    """
+
+    @abstractmethod
+    def begin_frame(self):
+        pass
+
+    @abstractmethod
+    def end_frame(self):
+        pass
+
+    @abstractmethod
+    def rectangle(
+            self,
+            owner: Hashable,
+            slot: Hashable,
+            rect: Tuple[float, float, float, float],
+            fill: str,
+            outline: str,
+            stipple: str = "",
+            layer: int = Layer.FIELD,
+    ):
+        """ Draws a rectangle, filled with a stipple pattern (gray75, gray50, gray25 or gray12) if it is given """
+        pass
+
+    @abstractmethod
+    def text(self, owner: Hashable, slot: Hashable, pos: Tuple[float, float], text: str, fill: str, font,
+             layer: int = Layer.INTERFACE):
+        """ Draws a text centered on the given position """
+        pass
+
+    @abstractmethod
+    def hide(self, owner: Hashable, slot: Hashable):
+        """ Hides a single item of the owner, without forgetting it """
+        pass
+
+    @abstractmethod
+    def keep(self, owner: Hashable):
+        """ Keeps the items of the owner on the display as they are, without redrawing any of them """
+        pass
+
+
+class CanvasDisplay(Display):
+
+    """
+    Display backend of a tkinter Canvas (the canvas is passed in, so this module does not import tkinter).
+    Coordinates and options of the canvas items are only updated if they have changed, and owners are hidden and shown
+    with a single call.
+    """
+
+    SHOWN = "shown"
+    OPTIONS = {
+        "rectangle": ("fill", "outline", "stipple"),
+        "text": ("text", "fill", "font"),
+    }
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._items = {}  # (owner, slot): [item id, coords, options, shown]
+        self._owners = {}  # owner: [tag, visible]
+        self._drawn = set()
+        self._top_layer = Layer.BACKGROUND
+        self._lowest_created = None
+
+    def begin_frame(self):
+        self._drawn.clear()
+
+    def end_frame(self):
+        """ Hides the owners which were not drawn in this frame, and shows the ones which were drawn again """
+        if self._lowest_created is not None:
+            # new items are stacked on top, so the layers above them have to be raised again
+            for above in range(self._lowest_created + 1, self._top_layer + 1):
+                self.canvas.tag_raise(f"layer{above}")
+            self._lowest_created = None
+
+        for owner, record in self._owners.items():
+            tag, visible = record
+            if visible != (drawn := owner in self._drawn):
+                self.canvas.itemconfigure(f"{tag}&&{self.SHOWN}", state="normal" if drawn else "hidden")
+                record[1] = drawn
+
+    def rectangle(
+            self,
+            owner: Hashable,
+            slot: Hashable,
+            rect: Tuple[float, float, float, float],
+            fill: str,
+            outline: str,
+            stipple: str = "",
+            layer: int = Layer.FIELD,
+    ):
+        self._draw(owner, slot, "rectangle", tuple(rect), (fill, outline, stipple), layer)
+
+    def text(self, owner: Hashable, slot: Hashable, pos: Tuple[float, float], text: str, fill: str, font,
+             layer: int = Layer.INTERFACE):
+        self._draw(owner, slot, "text", tuple(pos), (text, fill, font), layer)
+
+    def hide(self, owner: Hashable, slot: Hashable):
+        self._drawn.add(owner)
+        if (item := self._items.get((owner, slot))) is not None and item[3]:
+            self.canvas.itemconfigure(item[0], state="hidden")
+            self.canvas.dtag(item[0], self.SHOWN)
+            item[3] = False
+
+    def keep(self, owner: Hashable):
+        self._drawn.add(owner)
+
+    def _draw(self, owner, slot, kind, coords, options, layer):
+        self._drawn.add(owner)
+
+        if (item := self._items.get((owner, slot))) is None:
+            self._create(owner, slot, kind, coords, options, layer)
+            return
+
+        if item[1] != coords:
+            self.canvas.coords(item[0], *coords)
+            item[1] = coords
+        if item[2] != options:
+            self.canvas.itemconfigure(item[0], **dict(zip(self.OPTIONS[kind], options)))
+            item[2] = options
+        if not item[3]:
+            self.canvas.itemconfigure(item[0], state="normal")
+            self.canvas.addtag_withtag(self.SHOWN, item[0])
+            item[3] = True
+
+    def _create(self, owner, slot, kind, coords, options, layer):
+        if owner not in self._owners:
+            self._owners[owner] = [f"owner{len(self._owners)}", True]
+
+        tags = (self._owners[owner][0], f"layer{layer}", self.SHOWN)
+        extra = {"justify": "center"} if kind == "text" else {}
+        create = getattr(self.canvas, f"create_{kind}")
+        item_id = create(*coords, tags=tags, **dict(zip(self.OPTIONS[kind], options)), **extra)
+
+        self._top_layer = max(self._top_layer, layer)
+        if self._lowest_created is None or layer < self._lowest_created:
+            self._lowest_created = layer
+
+        self._items[(owner, slot)] = [item_id, coords, options, True]
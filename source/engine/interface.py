@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 from source.engine.settings import COLORS, LAYOUT
 from source.engine.tools import Vector, Rectangle
 from source.engine.events import EventHandler
+from source.engine.graphics import Display, Layer
+from source.engine.profiler import Profiler
 
-from tkinter import Tk, Canvas, Event
+from tkinter import Tk
 
-from typing import Union, Tuple, Dict
+from typing import Union, Tuple, Dict, Callable
 
 
 class Group:
@@ -15,6 +18,7 @@ class Group:
 
     def __init__(self, name: str = None):
         self.name = self.id() if name is None else name
+        self.boss = None
         self._widgets = []
         self._groups = []
 
@@ -26,43 +30,169 @@ class Group:
         cls._id += 1
         return str(cls._id)
 
+    def invalidate(self):
+        """ Notifies the interface (through the bosses) that a widget of the group has moved """
+        if self.boss is not None:
+            self.boss.invalidate()
+
+
+class HitIndex:
+    """ Uniform grid over the widget rectangles, to find the widgets under a point without testing all of them """
+
+    CELL = 64
+
+    def __init__(self, widgets=()):
+        self._cells = {}
+        for widget in widgets:
+            left, top, right, bottom = widget.rect
+            for column in range(int(left // self.CELL), int(right // self.CELL) + 1):
+                for row in range(int(top // self.CELL), int(bottom // self.CELL) + 1):
+                    self._cells.setdefault((column, row), []).append(widget)
+
+    def at(self, point: Vector) -> set:
+        """ :returns: the widgets under the point """
+        cell = (int(point.x // self.CELL), int(point.y // self.CELL))
+        return {widget for widget in self._cells.get(cell, ()) if widget.focused(point)}
+
 
 class Interface:
-    """ Class for managing WidgetGroup instances """
+    """
+    Class for managing WidgetGroup instances.
+    The hovered widgets are looked up in a hit index of the active widgets, only when the mouse has moved or clicked,
+    or when the active groups have changed. The index is rebuilt lazily, after groups are (de)activated or widgets
+    are moved.
+    Groups can be registered with a builder instead of being created up front, they are built on their first use.
+    """
 
     def __init__(self):
         self._all_groups = set()
         self._active_groups = set()
+        self._builders = {}
+        self._built = {}
+
+        self._index = HitIndex()
+        self._hovered = set()
+        self._stale = False
+        self._rehover = False
+        self.clicked = frozenset()
 
     def add_group(self, *groups: Group):
         self._all_groups.update(set(groups))
 
+    def register(self, name: str, builder: Callable[[], Group]):
+        """ Declares a group, which is created by calling the builder, the first time it is requested by group() """
+        self._builders[name] = builder
+
+    def group(self, name: str) -> Group:
+        """ :returns: the registered group with the given name, it is built at the first call """
+        if (group := self._built.get(name)) is None:
+            group = self._built[name] = self._builders[name]()
+        return group
+
+    def built(self, name: str) -> bool:
+        return name in self._built
+
+    def registered(self) -> list:
+        """ :returns: names of the registered groups """
+        return list(self._builders)
+
     def activate(self, *groups: Group):
         """ Activates given groups exclusively """
-        self._active_groups |= set(groups)
+        self._set_active(self._active_groups | set(groups))
 
     def deactivate(self, *groups: Group):
-        self._active_groups -= set(groups)
+        self._set_active(self._active_groups - set(groups))
+
+    def active(self, group: Group) -> bool:
+        return group in self._active_groups
+
+    def _set_active(self, groups: set):
+        """ The hit index is only rebuilt (and the hovered widgets looked up again) if the active groups change """
+        if groups != self._active_groups:
+            self._active_groups = groups
+            self._stale = self._rehover = True
+
+    def invalidate(self):
+        """ Marks the hit index to be rebuilt before the next lookup """
+        self._stale = True
+
+    def widgets(self):
+        """ :returns: iterator of the widgets of the active groups, including the ones in nested groups """
+        groups = list(self._active_groups)
+        while groups:
+            for item in groups.pop():
+                if isinstance(item, Group):
+                    groups.append(item)
+                else:
+                    yield item
+
+    def hover(self, point: Vector):
+        """ Updates the hovered state of the widgets, which are under the point (and of the ones which are not) """
+        if self._stale:
+            self._index = HitIndex(self.widgets())
+            self._stale = False
+        self._rehover = False
+
+        hovered = self._index.at(point)
+        for widget in self._hovered - hovered:
+            widget.hovered = False
+        for widget in hovered - self._hovered:
+            widget.hovered = True
+        self._hovered = hovered
 
     def events(self, event_handler: EventHandler):
+        if self._rehover or event_handler.moved or any(event_handler.click):
+            self.hover(event_handler.focus)
+        self.clicked = frozenset(self._hovered) if event_handler.click[0] else frozenset()
+
         for group in self._active_groups:
             group.events(event_handler)
 
-    def render(self, display: Canvas):
-        """ Renders widgets of all activated widget groups to the given surface """
+    def render(self, display: Display):
+        """ Renders widgets of all activated widget groups to the given display """
         for group in self._active_groups:
             group.render(display)
 
 
+class TextMetrics:
+    """ LRU cache of text sizes keyed by (font name, text), since every measurement of a font is a call into Tcl """
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self._sizes = OrderedDict()
+        self._linespaces = {}
+
+    def __call__(self, font, text: str) -> Tuple[int, int]:
+        """ :returns: width and height of the text in pixels """
+        key = (font.name, text)
+        if (dim := self._sizes.get(key)) is not None:
+            self._sizes.move_to_end(key)
+            return dim
+
+        if (height := self._linespaces.get(font.name)) is None:
+            height = self._linespaces[font.name] = font.metrics("linespace")
+        dim = self._sizes[key] = (font.measure(text), height)
+        if len(self._sizes) > self.size:
+            self._sizes.popitem(last=False)
+        return dim
+
+    def clear(self):
+        """ Forgets every size, call it after a font is configured """
+        self._sizes.clear()
+        self._linespaces.clear()
+
+
 class Widget(Rectangle, ABC):
     FONT = []
 
     def __init__(self, group: Group, dim: (int, int, int, int), align: str = "center"):
         Rectangle.__init__(self, *dim)
+        self.group = group
         group.add_widget(self)
         self.align = align
 
         self.base = None
+        self._indexed_rect = None
         self.snap(dim[:2])
 
         self.hovered = False
@@ -70,16 +200,20 @@ class Widget(Rectangle, ABC):
         self.last_hovered = False
 
     def snap(self, pos: Union[tuple, Vector]):
+        """ Aligns the widget to the position, the hit index is only rebuilt if its rectangle has changed """
         self.base = Vector(*pos)
         setattr(self, self.align, self.base)
+        if self.rect != self._indexed_rect:
+            self._indexed_rect = self.rect
+            self.group.invalidate()
 
     def events(self, event_handler: EventHandler):
-        self.hovered = self.focused(event_handler.focus)
+        """ The hovered state is set by the Interface """
         self.entered = self.hovered and not self.last_hovered
         self.last_hovered = self.hovered
 
     @abstractmethod
-    def render(self, display: Canvas):
+    def render(self, display: Display):
         pass
 
 
@@ -88,6 +222,7 @@ class WidgetGroup(Group):
     def __init__(self, boss: Union[Interface, Group], name: str = None, active: bool = False):
         super().__init__(name)
 
+        self.boss = boss
         boss.add_group(self)
         if active and isinstance(boss, Interface):
             boss.activate(self)
@@ -102,7 +237,7 @@ class WidgetGroup(Group):
         for item in self:
             item.events(event_handler)
 
-    def render(self, display: Canvas):
+    def render(self, display: Display):
         for item in self:
             item.render(display)
 
@@ -115,6 +250,7 @@ class WidgetGroup(Group):
 
 class TextLabel(Widget):
     FONT = []
+    METRICS = TextMetrics()
 
     def __init__(
             self,
@@ -135,20 +271,20 @@ class TextLabel(Widget):
             self.update_text(text)
 
     def text_dim(self, text: str) -> Tuple[int, int]:
-        width = self.font.measure(text)
-        height = self.font.metrics("linespace")
-        return width, height
+        return self.METRICS(self.font, text)
 
     def resize(self, width: int, height: int):
         super().resize(width, height)
         self.snap(self.base)
 
     def update_text(self, text: str):
+        if text == self.text:
+            return
         self.text = text
         self.resize(*self.text_dim(text))
 
-    def render(self, display: Canvas):
-        display.create_text(*self.center, text=self.text, justify="center", fill=self.color, font=self.font)
+    def render(self, display: Display):
+        display.text(self, "text", self.center, self.text, self.color, self.font)
 
     @property
     def font(self):
@@ -173,9 +309,8 @@ class Button(TextLabel):
         super().events(event_handler)
         self.pressed = self.hovered and event_handler.click[0]
 
-    def render(self, display):
-        color = self.color[self.hovered]
-        display.create_text(*self.center, text=self.text, justify="center", fill=color, font=self.font)
+    def render(self, display: Display):
+        display.text(self, "text", self.center, self.text, self.color[self.hovered], self.font)
 
 
 class Switch(TextLabel):
@@ -199,6 +334,8 @@ class Switch(TextLabel):
         self.switched = True
         self.state = state
         self.last_state = state
+        self._sized = None
+        self._widths = (0, 0)
 
     def relay(self):
         self.state = not self.state
@@ -213,14 +350,23 @@ class Switch(TextLabel):
         self.switched = self.state != self.last_state
         self.last_state = self.state
 
-    def render(self, display: Canvas):
-        color = self.color[self.hovered]
+    def fit(self):
+        """ Resizes the switch to its text and state, only when one of them has changed since the last fit """
+        if (self.text, self.state) == self._sized:
+            return
+        self._sized = self.text, self.state
         w1, h1 = self.text_dim(self.text)
         w2, h2 = self.text_dim(self.STATE_TEXT[self.state])
+        self._widths = w1, w2
         self.resize(w1 + w2, max(h1, h2))
+
+    def render(self, display: Display):
+        self.fit()
+        color = self.color[self.hovered]
+        w1, w2 = self._widths
         c1, c2 = self.midleft + Vector(w1 / 2, 0), self.midleft + Vector(w1 + w2 / 2, 0)
-        display.create_text(c1, text=self.text, justify="center", fill=color[0], font=self.font)
-        display.create_text(c2, text=self.STATE_TEXT[self.state], justify="center", fill=color[1], font=self.font)
+        display.text(self, "text", c1, self.text, color[0], self.font)
+        display.text(self, "state", c2, self.STATE_TEXT[self.state], color[1], self.font)
 
 
 class Slider(Widget):
@@ -259,7 +405,7 @@ class Slider(Widget):
     def events(self, event_handler: EventHandler):
         super().events(event_handler)
 
-        if self.focused(event_handler.focus) and event_handler.hold[0]:
+        if self.hovered and event_handler.hold[0]:
             self.hold = True
         if not event_handler.hold[0]:
             self.hold = False
@@ -270,10 +416,10 @@ class Slider(Widget):
 
         self.slider.left = self.slide + self.left - self.height / 2
 
-    def render(self, display: Canvas):
+    def render(self, display: Display):
         color = self.color[self.hovered or self.hold]
-        display.create_rectangle(*self.rail.rect, fill=color[0], outline=color[0])
-        display.create_rectangle(*self.slider.rect, fill=color[1], outline=color[1])
+        display.rectangle(self, "rail", self.rail.rect, color[0], color[0], layer=Layer.INTERFACE)
+        display.rectangle(self, "slider", self.slider.rect, color[1], color[1], layer=Layer.INTERFACE)
 
     @property
     def value(self):
@@ -309,8 +455,8 @@ class WindowHeader(Widget):
             window_focus = Vector(*self.framework.winfo_pointerxy()) - self.grab
             self.framework.geometry(f"+{window_focus.x}+{window_focus.y}")
 
-    def render(self, display: Canvas):
-        display.create_rectangle(*self.rect, fill=COLORS.HEADER, outline=COLORS.HEADER)
+    def render(self, display: Display):
+        display.rectangle(self, "rect", self.rect, COLORS.HEADER, COLORS.HEADER, layer=Layer.INTERFACE)
 
 
 class HeaderButton(Button):
@@ -319,9 +465,9 @@ class HeaderButton(Button):
         super().__init__(group, pos, colors=colors, align="topleft")
         self.resize(LAYOUT.TILE - LAYOUT.GAP * 8, LAYOUT.TILE - LAYOUT.GAP * 8)
 
-    def render(self, display: Canvas):
+    def render(self, display: Display):
         color = self.color[self.hovered]
-        display.create_rectangle(*self.rect, fill=color, outline=color)
+        display.rectangle(self, "rect", self.rect, color, color, layer=Layer.INTERFACE)
 
 
 class KeyConfigSwitch(Switch):
@@ -374,9 +520,8 @@ class KeyConfigSwitch(Switch):
         if self.switched:
             self.update_text(self.PLACEHOLDER if self.state else self.key_name)
 
-    def render(self, display: Canvas):
-        color = self.color[self.hovered]
-        display.create_text(*self.center, text=self.text, justify="center", fill=color, font=self.font)
+    def render(self, display: Display):
+        display.text(self, "text", self.center, self.text, self.color[self.hovered], self.font)
 
 
 class LabeledSlider(WidgetGroup):
@@ -440,6 +585,46 @@ class StatLabel(WidgetGroup):
 
         self.update_text = self._label.update_text
 
-    def render(self, display: Canvas):
+    def render(self, display: Display):
         self._label.render(display)
-        display.create_rectangle(*self._item.rect, fill=self.color[1], outline=self.color[1])
\ No newline at end of file
+        display.rectangle(self, "item", self._item.rect, self.color[1], self.color[1], layer=Layer.INTERFACE)
+
+
+class ProfilerOverlay(WidgetGroup):
+
+    """ Percentiles of the loop phases and the dropped frames of a Profiler, refreshed in every `interval` frames """
+
+    TIMINGS = ("frame", "events", "logic", "render")
+    LINE_SPACE = 20
+
+    def __init__(
+            self,
+            boss: Union[Interface, Group],
+            pos: Union[Tuple[int, int], Vector],
+            color: str,
+            profiler: Profiler,
+            interval: int = 30,
+    ):
+        super().__init__(boss, "Profiler")
+
+        self.profiler = profiler
+        self.interval = interval
+        self._frame = 0
+
+        self._labels = [
+            TextLabel(self, Vector(pos) + Vector(0, self.LINE_SPACE * row), color, "", 0, align="midleft")
+            for row in range(len(self.TIMINGS) + 2)
+        ]
+        self._labels[0].update_text(f"{'[ms]':<7}{'p50':>6}{'p95':>6}{'p99':>6}")
+
+    def refresh(self):
+        for label, name in zip(self._labels[1:], self.TIMINGS):
+            stats = self.profiler.stats(name)
+            label.update_text(f"{name:<7}{stats['p50']:6.1f}{stats['p95']:6.1f}{stats['p99']:6.1f}")
+        self._labels[-1].update_text(f"dropped {self.profiler.dropped} of {self.profiler.frames} frames")
+
+    def render(self, display: Display):
+        if self._frame % self.interval == 0:
+            self.refresh()
+        self._frame += 1
+        super().render(display)
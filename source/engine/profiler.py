@@ -0,0 +1,152 @@
+import json
+from array import array
+from time import perf_counter
+
+
+class RingBuffer:
+    """ Fixed-size buffer of the last measured values, which never allocates after it is created """
+
+    def __init__(self, size: int):
+        self._data = array("d", bytes(8 * size))
+        self._size = size
+        self._index = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float):
+        self._data[self._index] = value
+        self._index = (self._index + 1) % self._size
+        self._count = min(self._count + 1, self._size)
+
+    def values(self) -> list:
+        """ :returns: the stored values from the oldest to the newest """
+        if self._count < self._size:
+            return self._data[:self._count].tolist()
+        return self._data[self._index:].tolist() + self._data[:self._index].tolist()
+
+    def percentiles(self, *percents: float) -> tuple:
+        """ :returns: the given percentiles (0 - 100) of the stored values, with the nearest rank method """
+        values = sorted(self.values())
+        if not values:
+            return (0.0,) * len(percents)
+        return tuple(values[min(int(len(values) * percent / 100), len(values) - 1)] for percent in percents)
+
+
+class _Measure:
+    """ Context manager which adds the time spent in its block to a timing of the profiler """
+
+    __slots__ = ("_buffer", "_start")
+
+    def __init__(self, buffer: RingBuffer):
+        self._buffer = buffer
+        self._start = 0
+
+    def __enter__(self):
+        self._start = perf_counter()
+
+    def __exit__(self, *_):
+        self._buffer.append(perf_counter() - self._start)
+
+
+class Profiler:
+    """
+    Records how long the phases of the loop (and the states, see StateMachine) take in the last `size` frames.
+    Timings are stored in seconds, and created by their first use.
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, fps: int, size: int = 600):
+        """
+        Profiler init
+        :param fps: target frame rate, frames longer than its period count as dropped frames
+        :param size: number of measurements kept for each timing
+        """
+        self._period = 1 / fps
+        self._size = size
+        self._measures = {}
+        self.timings = {}
+        self.frames = 0
+        self.dropped = 0
+
+    def measure(self, name: str) -> _Measure:
+        """ :returns: context manager which measures the time spent in its block into the given timing """
+        if (measure := self._measures.get(name)) is None:
+            measure = self._measures[name] = _Measure(self.timing(name))
+        return measure
+
+    def timing(self, name: str) -> RingBuffer:
+        if (buffer := self.timings.get(name)) is None:
+            buffer = self.timings[name] = RingBuffer(self._size)
+        return buffer
+
+    def frame(self, dt: float):
+        """ Records the length of the last frame, and the number of frames missed during it """
+        self.frames += 1
+        self.timing("frame").append(dt)
+        if dt > self._period * 1.5:
+            self.dropped += round(dt / self._period) - 1
+
+    def stats(self, name: str) -> dict:
+        """ :returns: percentiles and maximum of a timing in ms """
+        buffer = self.timing(name)
+        stats = {f"p{percent}": value * 1000 for percent, value in zip(
+            self.PERCENTILES, buffer.percentiles(*self.PERCENTILES))}
+        stats["max"] = max(buffer.values(), default=0.0) * 1000
+        stats["count"] = len(buffer)
+        return stats
+
+    def report(self) -> dict:
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "timings": {name: self.stats(name) for name in self.timings},
+        }
+
+    def dump(self, path: str):
+        """ Writes the statistics and the raw timings (in ms) to a json file """
+        report = self.report()
+        report["samples"] = {name: [round(value * 1000, 3) for value in buffer.values()]
+                             for name, buffer in self.timings.items()}
+        with open(path, "w") as FILE:
+            json.dump(report, FILE, indent=2)
+
+    def reset(self):
+        self._measures.clear()
+        self.timings.clear()
+        self.frames = self.dropped = 0
+
+
+class LatencyProbe:
+    """
+    Follows the time stamps of inputs (see EventHandler.queue) through the simulation to the screen, and records the
+    press to simulate and press to render latencies as timings of a Profiler
+    """
+
+    SIMULATE = "press to simulate"
+    RENDER = "press to render"
+
+    def __init__(self, profiler: Profiler, timer=perf_counter):
+        """
+        LatencyProbe init
+        :param profiler: profiler to record the latencies in
+        :param timer: time source of the input stamps
+        """
+        self.profiler = profiler
+        self.timer = timer
+        self._pending = []
+
+    def simulated(self, stamp: float):
+        """ Called when an input with the given stamp has taken effect in the simulation """
+        self.profiler.timing(self.SIMULATE).append(self.timer() - stamp)
+        self._pending.append(stamp)
+
+    def rendered(self):
+        """ Called when a frame has been rendered, the simulated inputs are on the screen from now on """
+        if self._pending:
+            now = self.timer()
+            for stamp in self._pending:
+                self.profiler.timing(self.RENDER).append(now - stamp)
+            self._pending.clear()
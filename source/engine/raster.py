@@ -0,0 +1,238 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from typing import Hashable, Tuple
+
+from source.engine.graphics import Display, Layer
+
+
+class RasterDisplay(Display):
+
+    """
+    Offscreen Display backend, which rasterizes the items into an RGB framebuffer (a bytearray), without tkinter or a
+    display server. Useful for thumbnails, video export and visual regression tests.
+
+    The items are kept like on a canvas, and only the regions which have changed since the last frame are painted
+    again, so frames with little movement are cheap. Texts are drawn as approximate boxes of the characters, since
+    there are no fonts to rasterize.
+    """
+
+    STIPPLES = {  # set columns (of 4) in each row of the 4x4 tkinter bitmaps
+        "gray75": ((0, 1, 2), (0, 2, 3), (0, 1, 2), (0, 2, 3)),
+        "gray50": ((0, 2), (1, 3), (0, 2), (1, 3)),
+        "gray25": ((0,), (2,), (0,), (2,)),
+        "gray12": ((0,), (), (2,), ()),
+    }
+    MAX_REGIONS = 32  # more changed regions than this in a frame are painted again as one
+    BUCKET = 64  # size of the cells of the grid, which indexes the items by their position
+
+    def __init__(self, width: int, height: int, background: str = "#000000"):
+        self.width = width
+        self.height = height
+        self.background = self.rgb(background)
+        self.pixels = bytearray(self.background * (width * height))
+
+        self._items = {}  # (owner, slot): [kind, bounds, shape, (layer, number of the item), shown]
+        self._owners = {}  # owner: [visible, item keys]
+        self._buckets = {}  # (column, row) of the grid: item keys overlapping the cell
+        self._drawn = set()
+        self._regions = []
+
+    # === [ DRAWING PROTOCOL ] ======================================================================================= #
+
+    def begin_frame(self):
+        self._drawn.clear()
+
+    def end_frame(self):
+        for owner, record in self._owners.items():
+            if record[0] != (drawn := owner in self._drawn):
+                record[0] = drawn
+                for key in record[1]:
+                    if self._items[key][4]:
+                        self._regions.append(self._items[key][1])
+
+        if self._regions:
+            regions = self._regions
+            if len(regions) > self.MAX_REGIONS:
+                regions = [(min(region[0] for region in regions), min(region[1] for region in regions),
+                            max(region[2] for region in regions), max(region[3] for region in regions))]
+            for region in regions:
+                self._paint(region)
+            self._regions = []
+
+    def rectangle(
+            self,
+            owner: Hashable,
+            slot: Hashable,
+            rect: Tuple[float, float, float, float],
+            fill: str,
+            outline: str,
+            stipple: str = "",
+            layer: int = Layer.FIELD,
+    ):
+        x0, y0, x1, y1 = round(rect[0]), round(rect[1]), round(rect[2]), round(rect[3])
+        bounds = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self._draw(owner, slot, "rectangle", bounds, (fill, outline, stipple), layer)
+
+    def text(self, owner: Hashable, slot: Hashable, pos: Tuple[float, float], text: str, fill: str, font,
+             layer: int = Layer.INTERFACE):
+        width, height = self.cell(font)
+        lines = str(text).split("\n")
+        left = round(pos[0] - max(len(line) for line in lines) * width / 2)
+        top = round(pos[1] - len(lines) * height / 2)
+
+        boxes = []
+        for row, line in enumerate(lines):
+            shift = (max(len(line) for line in lines) - len(line)) * width // 2  # centered lines
+            for column, character in enumerate(line):
+                if not character.isspace():
+                    x, y = left + shift + column * width, top + row * height
+                    boxes.append((x + width // 6, y + height // 4, x + width - width // 6, y + height - height // 5))
+
+        bounds = (left, top, left + max(len(line) for line in lines) * width, top + len(lines) * height)
+        self._draw(owner, slot, "text", bounds, (tuple(boxes), fill), layer)
+
+    def hide(self, owner: Hashable, slot: Hashable):
+        self._drawn.add(owner)
+        if (item := self._items.get((owner, slot))) is not None and item[4]:
+            item[4] = False
+            self._regions.append(item[1])
+
+    def keep(self, owner: Hashable):
+        self._drawn.add(owner)
+
+    # === [ FRAMEBUFFER ] ============================================================================================ #
+
+    def to_ppm(self) -> bytes:
+        """ :returns: the framebuffer as a binary PPM image """
+        return f"P6 {self.width} {self.height} 255\n".encode() + bytes(self.pixels)
+
+    def save_ppm(self, path: str):
+        with open(path, "wb") as FILE:
+            FILE.write(self.to_ppm())
+
+    def array(self):
+        """ :returns: (height, width, 3) uint8 NumPy view of the framebuffer (requires NumPy) """
+        if np is None:
+            raise ImportError("RasterDisplay.array requires NumPy")
+        return np.frombuffer(self.pixels, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    @staticmethod
+    def rgb(color: str) -> bytes:
+        """ :returns: the 3 bytes of a #rrggbb color """
+        return bytes.fromhex(color[1:7])
+
+    @staticmethod
+    def cell(font) -> Tuple[int, int]:
+        """ :returns: approximate character size in pixels of a tkinter Font, a (family, size) tuple or a size """
+        if isinstance(font, int):
+            size = font
+        elif isinstance(font, tuple):
+            size = font[1]
+        else:
+            size = int(font.cget("size"))
+        size = abs(size) * 4 // 3 if size > 0 else abs(size)  # positive sizes are in points, negative in pixels
+        return max(size * 3 // 5, 1), max(size * 6 // 5, 1)
+
+    # === [ RASTERIZATION ] ========================================================================================== #
+
+    def _draw(self, owner, slot, kind, bounds, shape, layer):
+        self._drawn.add(owner)
+        key = (owner, slot)
+
+        if (item := self._items.get(key)) is None:
+            if owner not in self._owners:
+                self._owners[owner] = [True, []]
+            self._owners[owner][1].append(key)
+            self._items[key] = [kind, bounds, shape, (layer, len(self._items)), True]
+            self._index(key, bounds, True)
+            self._regions.append(bounds)
+            return
+
+        if item[1] != bounds or item[2] != shape or not item[4]:
+            if item[4]:
+                self._regions.append(item[1])
+            self._regions.append(bounds)
+            if item[1] != bounds:
+                self._index(key, item[1], False)
+                self._index(key, bounds, True)
+            item[1], item[2], item[4] = bounds, shape, True
+
+    def _cells(self, bounds):
+        size = self.BUCKET
+        for column in range(bounds[0] // size, (bounds[2] - 1) // size + 1):
+            for row in range(bounds[1] // size, (bounds[3] - 1) // size + 1):
+                yield column, row
+
+    def _index(self, key, bounds, add: bool):
+        for cell in self._cells(bounds):
+            if add:
+                self._buckets.setdefault(cell, set()).add(key)
+            else:
+                self._buckets[cell].discard(key)
+
+    def _paint(self, region):
+        """ Paints the region again from the background, with every visible item which overlaps it """
+        x0, y0, x1, y1 = max(region[0], 0), max(region[1], 0), min(region[2], self.width), min(region[3], self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        clip = (x0, y0, x1, y1)
+        self._fill(clip, self.background, clip)
+
+        items, owners, buckets = self._items, self._owners, self._buckets
+        keys = set()
+        for cell in self._cells(clip):
+            keys.update(buckets.get(cell, ()))
+
+        for key in sorted(keys, key=lambda item: items[item][3]):
+            kind, bounds, shape, _, shown = items[key]
+            if not shown or bounds[0] >= x1 or bounds[2] <= x0 or bounds[1] >= y1 or bounds[3] <= y0 \
+                    or not owners[key[0]][0]:
+                continue
+
+            if kind == "rectangle":
+                fill, outline, stipple = shape
+                if stipple:
+                    if fill:
+                        self._stipple(bounds, self.rgb(fill), self.STIPPLES[stipple], clip)
+                    continue
+                if fill:
+                    self._fill(bounds, self.rgb(fill), clip)
+                if outline and outline != fill:
+                    color = self.rgb(outline)
+                    left, top, right, bottom = bounds
+                    for edge in ((left, top, right, top + 1), (left, bottom - 1, right, bottom),
+                                 (left, top, left + 1, bottom), (right - 1, top, right, bottom)):
+                        self._fill(edge, color, clip)
+            else:
+                boxes, fill = shape
+                color = self.rgb(fill)
+                for box in boxes:
+                    self._fill(box, color, clip)
+
+    def _fill(self, rect, color: bytes, clip):
+        x0, y0, x1, y1 = max(rect[0], clip[0]), max(rect[1], clip[1]), min(rect[2], clip[2]), min(rect[3], clip[3])
+        if x0 >= x1 or y0 >= y1:
+            return
+        row, stride = color * (x1 - x0), self.width * 3
+        pixels, start = self.pixels, (y0 * self.width + x0) * 3
+        for offset in range(start, start + (y1 - y0) * stride, stride):
+            pixels[offset:offset + len(row)] = row
+
+    def _stipple(self, rect, color: bytes, pattern, clip):
+        x0, y0, x1, y1 = max(rect[0], clip[0]), max(rect[1], clip[1]), min(rect[2], clip[2]), min(rect[3], clip[3])
+        if x0 >= x1 or y0 >= y1:
+            return
+        pixels, width = self.pixels, self.width
+        for y in range(y0, y1):
+            line = y * width
+            for column in pattern[y % 4]:
+                first = x0 + (column - x0) % 4
+                if first >= x1:
+                    continue
+                count = (x1 - 1 - first) // 4 + 1
+                for channel in range(3):
+                    start = (line + first) * 3 + channel
+                    pixels[start:start + (count - 1) * 12 + 1:12] = color[channel:channel + 1] * count
@@ -1,5 +1,9 @@
 import json
 import os
+from dataclasses import dataclass
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import Tuple
 
 
 class PATH:
@@ -10,39 +14,258 @@ class PATH:
     SCORE = os.path.join(DATA, "score.json")
     SETTINGS = os.path.join(DATA, "settings.json")
     KEYBIND = os.path.join(DATA, "keybind.json")
+    REPLAY = os.path.join(DATA, "last_game.replay")
+    PROFILE = os.path.join(DATA, "profile.json")
+
+
+class JsonWriter:
+    """
+    Background writer of json files (and of binary ones, if the data is bytes). Changes are coalesced: a file is written
+    DELAY seconds after its last change, with the latest data only. Files are replaced atomically (temp file +
+    os.replace), so a crash in the middle of a write never leaves a corrupted file behind.
+    """
+
+    DELAY = 0.5  # s
+
+    def __init__(self):
+        self._condition = Condition()
+        self._write_lock = Lock()
+        self._pending = {}  # path -> data
+        self._changed = 0.0
+        self._thread = None
+
+    def write(self, path: str, data: (dict, bytes)):
+        """ Queues the data to be written to the file, instead of the data queued before """
+        with self._condition:
+            self._pending[path] = data
+            self._changed = monotonic()
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="JsonWriter", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """ Writes the queued data now, returns when every queued file (and the one being written) is on the disk """
+        with self._write_lock:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+            for path, data in pending.items():
+                self._write(path, data)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending or (delay := self._changed + self.DELAY - monotonic()) > 0:
+                    self._condition.wait(delay if self._pending else None)
+            self.flush()
+
+    @staticmethod
+    def _write(path: str, data: (dict, bytes)):
+        temp = f"{path}.tmp"
+        binary = isinstance(data, bytes)
+        try:
+            with open(temp, "wb" if binary else "w") as FILE:
+                if binary:
+                    FILE.write(data)
+                else:
+                    json.dump(data, FILE, indent=2, sort_keys=False)
+                FILE.flush()
+                os.fsync(FILE.fileno())
+            os.replace(temp, path)
+        except OSError as error:
+            print(f"WARNING: {path} could not be saved ({error})")
+
+
+WRITER = JsonWriter()
 
 
 class JsonData:
+    """
+    Values of a json file as attributes, the file is loaded at the first access, not at import time.
+    Setting a value notifies the callbacks bound to it, and saves the file in the background (see JsonWriter).
+    The defaults are merged into the loaded values (also into nested dicts), so files written by older versions get
+    the values added since then.
+    """
 
-    def __init__(self, path, read_only=True):
+    def __init__(self, path, read_only=True, defaults: dict = None):
         self._file = path
-        self._data = {}
-        self.load()
+        self._defaults = {} if defaults is None else defaults
+        self._data = None
+        self._callbacks = {}
         self.read_only = read_only
 
+    def __getattr__(self, name):
+        """ Only called for missing attributes: loads the file, if it has not been loaded yet """
+        if name.startswith("_") or self._data is not None:
+            raise AttributeError(f"{self._file} has no value {name!r}")
+        self.load()
+        return getattr(self, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_") or self._data is None or name not in self._data:
+            super().__setattr__(name, value)
+            return
+
+        changed = self.__dict__[name] != value
+        super().__setattr__(name, value)
+        if changed:
+            for callback in self._callbacks.get(name, []) + self._callbacks.get(None, []):
+                callback(name, value)
+            if not self.read_only:
+                self.save()
+
     def __iter__(self):
+        if self._data is None:
+            self.load()
         yield from self._data.items()
 
+    def bind(self, name: (str, None), callback):
+        """
+        Registers a callback for the changes of a value
+        :param name: name of the value, or None for every value
+        :param callback: called with the name and the new value
+        """
+        self._callbacks.setdefault(name, []).append(callback)
+
     def load(self):
         with open(self._file, "r") as FILE:
             self._data = json.load(FILE)
+        self._merge(self._data, self._defaults)
+        self.__dict__.update(self._data)
 
-        for key, value in self._data.items():
-            setattr(self, key, value)
+    @classmethod
+    def _merge(cls, data: dict, defaults: dict):
+        for name, value in defaults.items():
+            if isinstance(value, dict):
+                cls._merge(data.setdefault(name, {}), value)
+            else:
+                data.setdefault(name, value)
 
     def save(self):
+        """ Queues the values to be written by the background writer, call WRITER.flush() to wait for it """
+        if self._data is None:
+            return  # never loaded, so never changed
         if self.read_only:
             print(f"WARNING: {self._file} is read only!")
         else:
             for key in self._data:
                 self._data[key] = getattr(self, key)
-
-            with open(self._file, "w") as FILE:
-                json.dump(self._data, FILE, indent=2, sort_keys=False)
+            WRITER.write(self._file, dict(self._data))
 
 
 SETTINGS = JsonData(PATH.SETTINGS, read_only=False)
 COLORS = JsonData(PATH.COLORS)
 LAYOUT = JsonData(PATH.LAYOUT)
 SCORE = JsonData(PATH.SCORE, read_only=False)
-KEYS = JsonData(PATH.KEYBIND, read_only=False)
+# keys added after the first release, which are missing from older keybind files (also from their DEFAULT)
+ADDED_KEYS = {"PROFILER": 73}
+KEYS = JsonData(PATH.KEYBIND, read_only=False, defaults={**ADDED_KEYS, "DEFAULT": ADDED_KEYS})
+
+
+# === [ COMPILED CONFIG ] ============================================================================================ #
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """
+    Snapshot of the values, which are read in the hot paths of the game (per tile and per tick), with the derived
+    values precomputed. The values which can be changed in the game (like SETTINGS.WALLS) are not part of it.
+    """
+
+    tile: int
+    gap: int
+    tile_insets: Tuple[int, ...]  # GAP * gap, indexed by the gap of Field.tile_rect
+    eye_near: float  # offsets of the eyes in the head tile
+    eye_far: float
+    eye_size: int
+
+    field_color: str
+    fade_color: str
+    snake_color: str
+    pattern_color: str
+    apple_color: str
+    bonus_colors: Tuple[str, str]
+
+    starting_length: int
+    min_speed: int
+    max_speed: int
+    delays: Tuple[float, ...]  # time of a tick in ms, indexed by speed - min_speed
+    score_multipliers: Tuple[int, ...]  # indexed by speed - min_speed
+    apple_score: int
+    bonus_score: int
+    bonus_chance: float
+
+    MAX_GAP = 4  # largest gap of the tiles, see Field.render_tile
+
+    def __deepcopy__(self, memo):
+        return self  # frozen, so copies of the simulation (see Replay) can share it
+
+    @classmethod
+    def build(cls, layout: dict, colors: dict, settings: dict) -> "Config":
+        start, end, high, low = settings["SPEED_MAPPING"]
+        multiply = (low / high) ** (1.0 / (end - start))
+        speeds = range(start, end + 1)
+        return cls(
+            tile=layout["TILE"],
+            gap=layout["GAP"],
+            tile_insets=tuple(layout["GAP"] * gap for gap in range(cls.MAX_GAP + 1)),
+            eye_near=layout["GAP"] * 3.5,
+            eye_far=layout["TILE"] - layout["GAP"] * 6.5,
+            eye_size=layout["GAP"] * 3,
+            field_color=colors["FIELD"],
+            fade_color=colors["FADE"],
+            snake_color=colors["SNAKE"],
+            pattern_color=colors["PATTERN"],
+            apple_color=colors["APPLE"],
+            bonus_colors=tuple(colors["BONUS"]),
+            starting_length=settings["STARTING_LENGTH"],
+            min_speed=start,
+            max_speed=end,
+            # whole nanoseconds, so multiples of the delays are exact on a Clock
+            delays=tuple(round(high * multiply ** (speed - start), 6) for speed in speeds),
+            score_multipliers=tuple(end - start + speed for speed in speeds),
+            apple_score=settings["APPLE_SCORE"],
+            bonus_score=settings["BONUS_SCORE"],
+            bonus_chance=settings["BONUS_CHANCE"],
+        )
+
+
+# types of the values, which have to be in the files
+SCHEMA = {
+    PATH.LAYOUT: {"TILE": int, "GAP": int, "WIDTH": int, "HEIGHT": int, "FIELD_POS": list, "FIELD_SIZE": list},
+    PATH.COLORS: {"FIELD": str, "FADE": str, "SNAKE": str, "PATTERN": str, "APPLE": str, "BONUS": list},
+    PATH.SETTINGS: {"FPS": int, "STARTING_LENGTH": int, "STARTING_SPEED": int, "SPEED_MAPPING": list,
+                    "BONUS_CHANCE": (int, float), "APPLE_SCORE": int, "BONUS_SCORE": int, "WALLS": bool},
+}
+
+
+def validate(path: str, data: dict):
+    """ Checks the values of a file against the SCHEMA :raises ValueError: if a value is missing or invalid """
+    for key, kind in SCHEMA[path].items():
+        if key not in data:
+            raise ValueError(f"{path}: {key} is missing")
+        value = data[key]
+        if not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+            raise ValueError(f"{path}: {key} has to be {getattr(kind, '__name__', 'a number')}, not {value!r}")
+
+    if path == PATH.SETTINGS:
+        mapping = data["SPEED_MAPPING"]
+        if len(mapping) != 4 or not mapping[0] < mapping[1] or min(mapping) <= 0:
+            raise ValueError(f"{path}: SPEED_MAPPING has to be [slowest speed, fastest speed, slowest delay, "
+                             f"fastest delay], not {mapping!r}")
+    elif path == PATH.LAYOUT and not 0 <= data["GAP"] * Config.MAX_GAP * 2 < data["TILE"]:
+        raise ValueError(f"{path}: GAP is too large for a TILE of {data['TILE']}")
+
+
+_CONFIG = None
+
+
+def config() -> Config:
+    """ :returns: the config snapshot, which is built from the json files and validated at the first call """
+    global _CONFIG
+    if _CONFIG is None:
+        data = [dict(values) for values in (LAYOUT, COLORS, SETTINGS)]
+        for path, values in zip(SCHEMA, data):
+            validate(path, values)
+        _CONFIG = Config.build(*data)
+    return _CONFIG
@@ -1,4 +1,12 @@
-from abc import ABC, abstractmethod
+from abc import ABC
+
+
+class Transition:
+    """ Actions of the transition tables (see State.TRANSITIONS) """
+    SWITCH = "switch"  # replaces the current state
+    PUSH = "push"  # covers the current state with the target, until it is popped
+    POP = "pop"  # leaves the current state, and returns to the one it covers
+    RESET = "reset"  # leaves every state on the stack, and starts over from the target
 
 
 class State(ABC):
@@ -7,18 +15,13 @@ class State(ABC):
     Abstract class for game states. Subclass this to create new game states
     """
 
+    # trigger -> (Transition action, name of the target state), the target of a POP is None
+    TRANSITIONS = {}
+
     def __init__(self, name, state_machine):
         self.name = name
         self.state_machine = state_machine
 
-    @abstractmethod
-    def check_conditions(self) -> (str, None):
-        """
-        State transitions with their conditions should be implemented here
-        :returns: name of the next state for transition, or None for no transition
-        """
-        pass
-
     def entry_actions(self):
         """ This method is called each time when the state is entered """
         pass
@@ -27,6 +30,14 @@ class State(ABC):
         """ This method is called each time when the state is left """
         pass
 
+    def cover_actions(self):
+        """ This method is called when an other state is pushed over the state, it leaves the state by default """
+        self.exit_actions()
+
+    def uncover_actions(self):
+        """ This method is called when the state is current again after a pop, it enters the state by default """
+        self.entry_actions()
+
     def events(self, *args, **kwargs) -> None:
         """ Implement state specific event handling here """
         pass
@@ -39,17 +50,31 @@ class State(ABC):
         """ Implement state specific rendering here """
         pass
 
+    def wake_in(self) -> (float, None):
+        """
+        :returns: time in seconds until the state has to be updated without any input, 0 if it has to be updated in
+        every frame, or None if it only changes on input (so the loop can sleep until the next event)
+        """
+        return None
+
 
 class StateMachine(ABC):
 
-    """ Base class for a state machine based game framework, which handles State objects """
+    """
+    Base class for a pushdown state machine based game framework, which handles State objects.
+    Triggers (button and key names, or any other event) are dispatched to the machine, and looked up in the transition
+    table of the current state at the start of the next frame, so no condition is polled.
+    If a Profiler is set, the logic and rendering of each state is measured in it.
+    """
+
+    profiler = None
 
     def __init__(self, initial: State) -> None:
         self.initial = initial.name
         self._states = {}
+        self._stack = [initial]
+        self._triggers = []
         self.add_state(initial)
-        self._active = initial
-        self._last = initial
         initial.entry_actions()
 
     def add_state(self, *states: State) -> None:
@@ -60,26 +85,61 @@ class StateMachine(ABC):
     @property
     def current_state(self) -> str:
         """ returns: name of the current state """
-        return self._active.name
-
-    @property
-    def last_state(self) -> State:
-        """ returns: name of the current state """
-        return self._last.name
+        return self._stack[-1].name
 
     @current_state.setter
     def current_state(self, name: str) -> None:
-        """ Executes proper change between states """
-        self._active.exit_actions()
-        self._last = self._active
-        self._active = self._states[name]
-        self._active.entry_actions()
+        """ Leaves every state, and enters the given one """
+        self.transition(Transition.RESET, name)
 
-    def update_states(self) -> None:
-        """ Method for handling state actions, and state transitions """
-        if (new_state := self._active.check_conditions()) is not None:
-            self.current_state = new_state
+    @property
+    def state_stack(self) -> list:
+        """ returns: names of the states from the bottom of the stack to the current one """
+        return [state.name for state in self._stack]
+
+    def dispatch(self, trigger) -> None:
+        """ Queues a trigger for the transition table of the current state """
+        self._triggers.append(trigger)
+
+    def transition(self, action: str, target: str = None) -> None:
+        """ Executes proper change between states, see Transition for the actions """
+        if action == Transition.PUSH:
+            self._stack[-1].cover_actions()
+        else:
+            self._stack.pop().exit_actions()
+
+        if action == Transition.POP:
+            self._stack[-1].uncover_actions()
+            return
+        if action == Transition.RESET:
+            self._stack.clear()  # covered states have been left when they were covered
+        self._stack.append(self._states[target])
+        self._stack[-1].entry_actions()
 
-    def state_events(self, *args, **kwargs): self._active.events(*args, **kwargs)
-    def state_logic(self, *args, **kwargs): self._active.logic(*args, **kwargs)
-    def state_render(self, *args, **kwargs): self._active.render(*args, **kwargs)
+    def update_states(self) -> None:
+        """ Takes the first dispatched trigger, which is in the transition table of the current state """
+        triggers, self._triggers = self._triggers, []
+        table = self._stack[-1].TRANSITIONS
+        for trigger in triggers:
+            if (transition := table.get(trigger)) is not None:
+                self.transition(*transition)
+                break
+
+    def state_events(self, *args, **kwargs): self._stack[-1].events(*args, **kwargs)
+    def state_logic(self, *args, **kwargs):
+        state = self._stack[-1]
+        if self.profiler is None:
+            state.logic(*args, **kwargs)
+        else:
+            with self.profiler.measure(f"{state.name} logic"):
+                state.logic(*args, **kwargs)
+
+    def state_wake_in(self): return self._stack[-1].wake_in()
+
+    def state_render(self, *args, **kwargs):
+        state = self._stack[-1]
+        if self.profiler is None:
+            state.render(*args, **kwargs)
+        else:
+            with self.profiler.measure(f"{state.name} render"):
+                state.render(*args, **kwargs)
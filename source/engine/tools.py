@@ -1,3 +1,4 @@
+from array import array
 
 
 class Vector(list):
@@ -40,33 +41,47 @@ class Vector(list):
 
 class Matrix:
 
-    def __init__(self, width, height):
-        self._data = [[0 for _ in range(width)] for _ in range(height)]
+    """ Grid of small integers, stored row by row in a flat array """
+
+    def __init__(self, width, height, typecode="b"):
+        self._data = array(typecode, [0]) * (width * height)
         self._width, self._height = width, height
-        self._index = [0, 0]  # x, y
+
+    @property
+    def size(self):
+        return self._width, self._height
 
     def __getitem__(self, at):
         x, y = at
-        return self._data[y][x]
+        return self._data[y * self._width + x]
 
     def __setitem__(self, at, value):
         x, y = at
-        self._data[y][x] = value
+        self._data[y * self._width + x] = value
 
     def __iter__(self):
-        self._index = [-1, 0]  # x, y
-        return self
-
-    def __next__(self):
-        self._index[0] += 1
-
-        if self._index[0] >= self._width:
-            self._index[0] = 0
-            self._index[1] += 1
-
-            if self._index[1] >= self._height:
-                raise StopIteration
-        return self[self._index], self._index[:]
+        """ :returns: a new iterator of (value, (x, y)) pairs, so nested iterations do not interfere """
+        data, width = self._data, self._width
+        for y in range(self._height):
+            row = y * width
+            for x in range(width):
+                yield data[row + x], (x, y)
+
+    def fill(self, value):
+        self._data[:] = array(self._data.typecode, [value]) * len(self._data)
+
+    def count(self, value) -> int:
+        return self._data.count(value)
+
+    def where(self, value):
+        """ :returns: iterator of the (x, y) positions holding the given value, searched in C """
+        data, width, index = self._data, self._width, -1
+        while True:
+            try:
+                index = data.index(value, index + 1)
+            except ValueError:
+                return
+            yield index % width, index // width
 
 
 class Rectangle:
@@ -160,3 +175,4 @@ class Direction:
     DOWN = Vector(0, 1)
     LEFT = Vector(-1, 0)
     RIGHT = Vector(1, 0)
+    ALL = (UP, DOWN, LEFT, RIGHT)
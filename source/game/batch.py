@@ -0,0 +1,167 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from source.engine.settings import SETTINGS, LAYOUT, config
+
+
+class BatchSnakeSim:
+
+    """
+    Vectorized version of SnakeSim, which steps many independent games at once.
+
+    The boards are stored in a single (N, H, W) int array. A snake tile holds the tick when it leaves the board, so
+    it is occupied while its value is greater than the tick counter of its board, and the body ages without touching
+    the array. Empty tiles are 0 (or an expired tick), apples are -1 and bonuses are -2.
+
+    Actions are indices of DIRECTIONS, or -1 to keep the current direction. Finished boards are reset automatically.
+    Requires NumPy.
+    """
+
+    DIRECTIONS = ("UP", "DOWN", "LEFT", "RIGHT")
+    APPLE = -1
+    BONUS = -2
+
+    def __init__(self, count: int, size: (int, int) = None, speed: int = None, walls: bool = None, seed=None):
+        if np is None:
+            raise ImportError("BatchSnakeSim requires NumPy")
+
+        self.config = config()
+        self.count = count
+        self.width, self.height = LAYOUT.FIELD_SIZE if size is None else size
+        self.speed = SETTINGS.STARTING_SPEED if speed is None else speed
+        self.walls = SETTINGS.WALLS if walls is None else walls
+        self.score_multiplier = self.config.score_multipliers[self.speed - self.config.min_speed]
+        self.bonus_lifetime = self.width + self.height  # in ticks, see Bonus.update_lifetime
+
+        self.rng = np.random.default_rng(seed)
+
+        self._dx = np.array([0, 0, -1, 1])
+        self._dy = np.array([-1, 1, 0, 0])
+        self._opposite = np.array([1, 0, 3, 2])
+        self._all = np.arange(count)
+
+        self.board = np.zeros((count, self.height, self.width), dtype=np.int32)
+        self.ticks = np.zeros(count, dtype=np.int32)
+        self.x = np.zeros(count, dtype=np.int64)
+        self.y = np.zeros(count, dtype=np.int64)
+        self.direction = np.zeros(count, dtype=np.int64)
+        self.length = np.zeros(count, dtype=np.int32)
+        self.scores = np.zeros(count, dtype=np.int64)
+        self.apples = np.zeros(count, dtype=np.int32)
+        self.bonuses = np.zeros(count, dtype=np.int32)
+        self.apple_x = np.zeros(count, dtype=np.int64)
+        self.apple_y = np.zeros(count, dtype=np.int64)
+        self.apple_placed = np.zeros(count, dtype=bool)
+        self.bonus_active = np.zeros(count, dtype=bool)
+        self.bonus_x = np.zeros(count, dtype=np.int64)
+        self.bonus_y = np.zeros(count, dtype=np.int64)
+        self.bonus_expire = np.zeros(count, dtype=np.int32)
+
+        self.reset(self._all)
+
+    def reset(self, boards=None):
+        """ Starts new games on the given boards (on all of them by default) """
+        boards = self._all if boards is None else np.asarray(boards)
+        count, length = len(boards), self.config.starting_length
+
+        self.board[boards] = 0
+        self.ticks[boards] = 0
+        self.length[boards] = length
+        self.scores[boards] = 0
+        self.apples[boards] = 0
+        self.bonuses[boards] = 0
+        self.bonus_active[boards] = False
+
+        x = self.x[boards] = self.rng.integers(4, self.width - 4, count)
+        y = self.y[boards] = self.rng.integers(4, self.height - 4, count)
+        direction = self.direction[boards] = self.rng.integers(0, 4, count)
+
+        for tile in range(length):
+            tail_x = (x - self._dx[direction] * tile) % self.width
+            tail_y = (y - self._dy[direction] * tile) % self.height
+            self.board[boards, tail_y, tail_x] = length - tile
+
+        cells = self._random_free(boards)
+        self.apple_x[boards], self.apple_y[boards] = cells % self.width, cells // self.width
+        self.board[boards, self.apple_y[boards], self.apple_x[boards]] = self.APPLE
+        self.apple_placed[boards] = True
+
+    def step(self, actions):
+        """
+        Advances every board by one tick
+        :param actions: direction index (or -1) for each board
+        :returns: rewards and dones arrays, the finished boards are already reset when this returns
+        """
+        actions = np.asarray(actions)
+        turn = (actions >= 0) & (actions != self._opposite[self.direction])
+        self.direction = np.where(turn, actions, self.direction)
+        self.ticks += 1
+
+        x = self.x + self._dx[self.direction]
+        y = self.y + self._dy[self.direction]
+
+        rewards = np.zeros(self.count, dtype=np.int64)
+        if self.walls:
+            dones = (x < 0) | (x >= self.width) | (y < 0) | (y >= self.height)
+        else:
+            dones = np.zeros(self.count, dtype=bool)
+        x %= self.width
+        y %= self.height
+
+        expired = ~dones & self.bonus_active & (self.ticks >= self.bonus_expire)
+        self.board[expired, self.bonus_y[expired], self.bonus_x[expired]] = 0
+        self.bonus_active &= ~expired
+
+        dones |= self.board[self._all, y, x] > self.ticks
+        live = ~dones
+        self.x = np.where(live, x, self.x)
+        self.y = np.where(live, y, self.y)
+
+        ate = live & self.apple_placed & (self.x == self.apple_x) & (self.y == self.apple_y)
+        self.length += ate
+        self.board[live, self.y[live], self.x[live]] = self.ticks[live] + self.length[live]
+        rewards += ate * (self.config.apple_score * self.score_multiplier)
+        self.apples += ate
+
+        if (missing := np.flatnonzero(live & ~ate & ~self.apple_placed)).size:
+            self._place_apples(missing)  # no tile was empty when the apple was last eaten
+
+        if (eaten := np.flatnonzero(ate)).size:
+            covered = (self.board[eaten].reshape(eaten.size, -1) > self.ticks[eaten, None]).all(axis=1)
+            dones[eaten[covered]] = True  # the snake covers the board, the game is won
+            self._place_apples(eaten)
+
+            spawn = eaten[~self.bonus_active[eaten] & (self.rng.random(eaten.size) < self.config.bonus_chance)]
+            cells = self._random_free(spawn)
+            spawn, cells = spawn[cells >= 0], cells[cells >= 0]
+            self.bonus_x[spawn], self.bonus_y[spawn] = cells % self.width, cells // self.width
+            self.board[spawn, self.bonus_y[spawn], self.bonus_x[spawn]] = self.BONUS
+            self.bonus_active[spawn] = True
+            self.bonus_expire[spawn] = self.ticks[spawn] + self.bonus_lifetime
+
+        got = live & self.bonus_active & (self.x == self.bonus_x) & (self.y == self.bonus_y)
+        self.bonus_active &= ~got
+        rewards += got * (self.config.bonus_score * self.score_multiplier)
+        self.bonuses += got
+
+        self.scores += rewards
+        if dones.any():
+            self.reset(np.flatnonzero(dones))
+        return rewards, dones
+
+    def _place_apples(self, boards):
+        """ Puts new apples to the given boards, apple_placed is False where no tile was empty """
+        cells = self._random_free(boards)
+        placed = self.apple_placed[boards] = cells >= 0
+        boards, cells = boards[placed], cells[placed]
+        self.apple_x[boards], self.apple_y[boards] = cells % self.width, cells // self.width
+        self.board[boards, self.apple_y[boards], self.apple_x[boards]] = self.APPLE
+
+    def _random_free(self, boards):
+        """ :returns: flat index of a uniformly chosen empty tile on each given board, or -1 if the board is full """
+        cells = self.board[boards].reshape(len(boards), self.width * self.height)
+        free = (cells >= 0) & (cells <= self.ticks[boards, None])
+        keys = np.where(free, self.rng.random(free.shape), -1.0)
+        return np.where(free.any(axis=1), keys.argmax(axis=1), -1)
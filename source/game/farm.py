@@ -0,0 +1,122 @@
+"""
+Game farm, which plays many seeded headless games on all cores, to evaluate bots.
+
+Every game gets its own SnakeSim seeded with `seed + index`, so the results of a run are the same for any number of
+workers. Run it from the project root:
+
+    python -m source.game.farm --games 1000 --seed 0
+"""
+
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import mean, median, pstdev
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from source.engine.tools import Vector, Direction
+from source.game.simulation import SnakeSim
+
+
+class GameResult(NamedTuple):
+    game: int
+    seed: int
+    score: int
+    apples: int
+    bonuses: int
+    ticks: int
+    cause: str
+
+
+def greedy(sim: SnakeSim) -> Optional[Vector]:
+    """ Simple bot: heads for the apple on the shortest way, but never steps on the body if it can be avoided """
+    width, height = sim.field.size
+    head, apple = sim.snake.position, sim.apple.position
+    best, best_distance = None, None
+
+    for direction in (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT):
+        if direction == -sim.snake.direction:
+            continue
+
+        x, y = head + direction
+        if not (width > x >= 0 and height > y >= 0):
+            if sim.walls:
+                continue
+            x, y = x % width, y % height
+        if sim.field[x, y] > 0:
+            continue
+
+        dx, dy = abs(apple.x - x), abs(apple.y - y)
+        if not sim.walls:
+            dx, dy = min(dx, width - dx), min(dy, height - dy)
+        if best is None or dx + dy < best_distance:
+            best, best_distance = direction, dx + dy
+
+    return best
+
+
+def play(game: int, seed: int, policy: Callable = greedy, max_ticks: int = 100000, speed: int = None,
+         walls: bool = None) -> GameResult:
+    """ Plays a single game until it is over, or until max_ticks have passed """
+    sim = SnakeSim(seed=seed)
+    sim.reset(speed, walls)
+
+    while not sim.game_over and sim.ticks < max_ticks:
+        sim.step(policy(sim))
+
+    return GameResult(game, seed, sim.score, sim.snake.stats["apple"], sim.snake.stats["bonus"], sim.ticks,
+                      sim.cause if sim.game_over else "timeout")
+
+
+def run(games: int, seed: int = 0, workers: int = None, policy: Callable = greedy, **options) -> Iterator[GameResult]:
+    """
+    Plays the games on a process pool, and yields their results as they complete
+    :param games: number of games
+    :param seed: seed of the first game, the others get the following seeds
+    :param workers: number of processes, all cores by default
+    :param policy: picklable (module level) function, which returns the next direction for a SnakeSim, or None
+    :param options: max_ticks, speed and walls for play()
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play, game, seed + game, policy, **options) for game in range(games)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(results: Iterable[GameResult]) -> dict:
+    """ :returns: summary statistics of the results, independent of the order they arrived in """
+    results = sorted(results)
+    scores = [result.score for result in results]
+    return {
+        "games": len(results),
+        "score_mean": mean(scores),
+        "score_median": median(scores),
+        "score_stdev": pstdev(scores),
+        "score_min": min(scores),
+        "score_max": max(scores),
+        "apples_mean": mean(result.apples for result in results),
+        "bonuses_mean": mean(result.bonuses for result in results),
+        "ticks_mean": mean(result.ticks for result in results),
+        "causes": dict(Counter(result.cause for result in results)),
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Plays seeded headless games with the greedy bot on all cores")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-ticks", type=int, default=100000)
+    arguments = parser.parse_args()
+
+    results = []
+    for result in run(arguments.games, arguments.seed, arguments.workers, max_ticks=arguments.max_ticks):
+        results.append(result)
+        print(f"game {result.game:>5}  seed {result.seed:>6}  score {result.score:>6}  apples {result.apples:>4}  "
+              f"bonuses {result.bonuses:>3}  ticks {result.ticks:>6}  {result.cause}")
+
+    for key, value in summarize(results).items():
+        print(f"{key:>14}: {value}")
+
+
+if __name__ == "__main__":
+    main()
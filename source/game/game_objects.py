@@ -1,180 +1,300 @@
-from random import choice, randrange
+from array import array
+from collections import deque
+from random import Random
 
-from source.engine.clock import Timer
-from source.engine.settings import SETTINGS, COLORS, LAYOUT
+from source.engine.clock import Scheduler
+from source.engine.graphics import Layer
+from source.engine.settings import SETTINGS, config
 from source.engine.tools import Vector, Matrix, Rectangle, Direction
 
 
 class Field(Matrix, Rectangle):
 
-    def __init__(self, pos, dim):
+    ITEMS = (1, -1, -2, -3)  # values of the drawn cells: snake, apple and the two blink states of the bonus
+
+    def __init__(self, pos, dim, rng: Random = None):
+        self.config = config()
         Matrix.__init__(self, *dim)
-        Rectangle.__init__(self, *pos, dim[0] * LAYOUT.TILE, dim[0] * LAYOUT.TILE)
+        Rectangle.__init__(self, *pos, dim[0] * self.config.tile, dim[0] * self.config.tile)
 
-    def clear(self):
-        for value, at in self:
-            self[at] = 0
+        # corners of the tiles without their gap, for tile_rect
+        self._columns = tuple(x * self.config.tile + self.left for x in range(dim[0]))
+        self._rows = tuple(y * self.config.tile + self.top for y in range(dim[1]))
+
+        # free cell index: the first _free_count items of _free are the flat indices of the empty cells,
+        # and _slot maps every flat index to its place in _free, so cells can be swapped in and out in O(1)
+        self.rng = Random() if rng is None else rng
+        self._free = self._slot = None
+        self._free_count = 0
 
-    def update(self):
-        for item, at in self:
-            if item > 0:
-                self[at] -= 1
+        # cells which have to be drawn again, they are consumed by render()
+        self.dirty = set()
+        self._invalid = True
+        self._shown = set()  # cells drawn with an item, the others are hidden on the display
+        self.clear()
+
+    def __setitem__(self, at, value):
+        x, y = at
+        index = y * self._width + x
+        self.dirty.add((x, y))
+        if (self._data[index] == 0) != (value == 0):
+            self._swap(index, self._free_count - (value != 0))
+            self._free_count += 1 if value == 0 else -1
+        self._data[index] = value
+
+    def _swap(self, index, slot):
+        """ Moves the cell with the given flat index to the given slot of the free cell index """
+        other = self._free[slot]
+        self._free[self._slot[index]] = other
+        self._slot[other] = self._slot[index]
+        self._free[slot] = index
+        self._slot[index] = slot
+
+    def clear(self):
+        self.fill(0)
+        self._free = array("i", range(len(self._data)))
+        self._slot = array("i", range(len(self._data)))
+        self._free_count = len(self._data)
+        self.invalidate()
+
+    def mark(self, at):
+        """ Marks a cell to be drawn again, without changing it """
+        self.dirty.add(tuple(at))
+
+    def invalidate(self):
+        """ Marks every cell to be drawn again in the next render (for example, after a bulk change) """
+        self._invalid = True
+
+    def random_free(self, rng: Random = None):
+        """ :returns: a uniformly chosen empty cell (using the field's own generator by default), or None if full """
+        if self._free_count:
+            index = self._free[(self.rng if rng is None else rng).randrange(self._free_count)]
+            return index % self._width, index // self._width
 
     def tile_rect(self, at, gap=1):
         x, y = at
-        return (
-            x * LAYOUT.TILE + LAYOUT.GAP * gap + self.left,
-            y * LAYOUT.TILE + LAYOUT.GAP * gap + self.top,
-            (x + 1) * LAYOUT.TILE - LAYOUT.GAP * gap + self.left,
-            (y + 1) * LAYOUT.TILE - LAYOUT.GAP * gap + self.top,
-        )
+        left, top, tile, inset = self._columns[x], self._rows[y], self.config.tile, self.config.tile_insets[gap]
+        return left + inset, top + inset, left + tile - inset, top + tile - inset
 
     def render(self, display, snake):
-        for item, at in self:
-            if item > 0:
-                display.create_rectangle(*self.tile_rect(at), fill=COLORS.SNAKE, outline=COLORS.FIELD)
-                if item == snake.length:
-                    close = LAYOUT.GAP * 3.5
-                    far = LAYOUT.TILE - LAYOUT.GAP * 6.5
-
-                    left = Rectangle(0, 0, LAYOUT.GAP * 3, LAYOUT.GAP * 3)
-                    right = Rectangle(0, 0, LAYOUT.GAP * 3, LAYOUT.GAP * 3)
-
-                    if snake.heading.x < 0:
-                        left.left = right.left = close
-                        left.top, right.top = close, far
-                    elif snake.heading.x > 0:
-                        left.left = right.left = far
-                        left.top, right.top = close, far
-
-                    if snake.heading.y > 0:
-                        left.top = right.top = far
-                        left.left, right.left = far, close
-                    elif snake.heading.y < 0:
-                        left.top = right.top = close
-                        left.left, right.left = far, close
-
-                    left.move(Vector(at) * LAYOUT.TILE + self.pos)
-                    right.move(Vector(at) * LAYOUT.TILE + self.pos)
-
-                    display.create_rectangle(*left.rect, fill=COLORS.PATTERN, outline=COLORS.PATTERN)
-                    display.create_rectangle(*right.rect, fill=COLORS.PATTERN, outline=COLORS.PATTERN)
-
-                else:
-                    display.create_rectangle(*self.tile_rect(at, 4), fill=COLORS.PATTERN, outline=COLORS.SNAKE)
-            elif item == -1:
-                display.create_rectangle(*self.tile_rect(at, 2), fill=COLORS.APPLE, outline=COLORS.FIELD)
-            elif item in (-2, -3):
-                color = COLORS.BONUS[item+3]
-                display.create_rectangle(*self.tile_rect(at, 5+item), fill=color, outline=COLORS.FIELD)
+        """ Draws the dirty cells only, the rest of the tiles are kept on the display as they are """
+        display.keep(self)
+
+        if self._invalid:
+            # only the cells holding an item are looked up (in C), and the ones which held one are hidden
+            items = {at: item for item in self.ITEMS for at in self.where(item)}
+            for at in self._shown - items.keys():
+                self.render_tile(display, snake, 0, at)
+            for at, item in items.items():
+                self.render_tile(display, snake, item, at)
+            self._invalid = False
+        else:
+            for at in self.dirty:
+                self.render_tile(display, snake, self[at], at)
+        self.dirty.clear()
+
+    def render_tile(self, display, snake, item, at):
+        x, y = at
+        base, pattern = ("base", x, y), ("pattern", x, y)
+        config = self.config
+
+        if item > 0:
+            display.rectangle(self, base, self.tile_rect(at), config.snake_color, config.field_color)
+            if (x, y) == tuple(snake.position):
+                display.hide(self, pattern)
+                self.render_eyes(display, snake, at)
+            else:
+                display.rectangle(self, pattern, self.tile_rect(at, 4), config.pattern_color, config.snake_color,
+                                  layer=Layer.DETAIL)
+        elif item == -1:
+            display.rectangle(self, base, self.tile_rect(at, 2), config.apple_color, config.field_color)
+            display.hide(self, pattern)
+        elif item in (-2, -3):
+            color = config.bonus_colors[item+3]
+            display.rectangle(self, base, self.tile_rect(at, 5+item), color, config.field_color)
+            display.hide(self, pattern)
+        else:
+            display.hide(self, base)
+            display.hide(self, pattern)
+            self._shown.discard(at)
+            return
+        self._shown.add(at)
+
+    def render_eyes(self, display, snake, at):
+        config = self.config
+        close, far = config.eye_near, config.eye_far
+
+        left = Rectangle(0, 0, config.eye_size, config.eye_size)
+        right = Rectangle(0, 0, config.eye_size, config.eye_size)
+
+        if snake.heading.x < 0:
+            left.left = right.left = close
+            left.top, right.top = close, far
+        elif snake.heading.x > 0:
+            left.left = right.left = far
+            left.top, right.top = close, far
+
+        if snake.heading.y > 0:
+            left.top = right.top = far
+            left.left, right.left = far, close
+        elif snake.heading.y < 0:
+            left.top = right.top = close
+            left.left, right.left = far, close
+
+        corner = Vector(self._columns[at[0]], self._rows[at[1]])
+        left.move(corner)
+        right.move(corner)
+
+        color = config.pattern_color
+        display.rectangle(self, "left eye", left.rect, color, color, layer=Layer.DETAIL)
+        display.rectangle(self, "right eye", right.rect, color, color, layer=Layer.DETAIL)
 
     def render_background(self, display):
-        display.create_rectangle(*self.rect, fill=COLORS.FIELD, outline=COLORS.FIELD)
+        color = self.config.field_color
+        display.rectangle((self, "background"), "rect", self.rect, color, color, layer=Layer.BACKGROUND)
 
     def fade_content(self, display):
-        display.create_rectangle(*self.rect, fill=COLORS.FADE, outline=COLORS.FADE, stipple='gray75')
+        color = self.config.fade_color
+        display.rectangle((self, "fade"), "rect", self.rect, color, color, stipple="gray75", layer=Layer.OVERLAY)
 
 
 class Snake:
 
-    def __init__(self, field):
+    ID = 1
+
+    def __init__(self, field, rng: Random = None):
+        self.rng = Random() if rng is None else rng
         self.position = self.direction = self.heading = self.stats = self.length = self.speed = None
+        self.body = deque()  # (position, tick of leaving the field) from tail to head
+        self._tick = 0
         self.reset(field)
-        self.delays = {i: self.delay(i) for i in range(SETTINGS.SPEED_MAPPING[0], SETTINGS.SPEED_MAPPING[1]+1)}
-
-        self.turn_queue = []
 
     @property
     def next_position(self):
         return self.position + self.direction
 
     def reset(self, field):
-        self.position = Vector(randrange(LAYOUT.FIELD_SIZE[0] - 8) + 4, randrange(LAYOUT.FIELD_SIZE[1] - 8) + 4)
-        self.direction = choice((Direction.LEFT, Direction.RIGHT, Direction.UP, Direction.DOWN))
+        width, height = field.size
+        self.position = Vector(self.rng.randrange(width - 8) + 4, self.rng.randrange(height - 8) + 4)
+        self.direction = self.rng.choice((Direction.LEFT, Direction.RIGHT, Direction.UP, Direction.DOWN))
         self.heading = Vector(self.direction)
-        self.length = SETTINGS.STARTING_LENGTH
+        self.length = config().starting_length
         self.speed = SETTINGS.STARTING_SPEED
         self.stats = {"apple": 0, "bonus": 0}
-
-        for tile in range(self.length):
-            field[self.position - self.direction * tile] = self.length - tile
+        self.turn_queue = []  # (direction, time of the input or None)
+        self.applied = None
+
+        self.body.clear()
+        self._tick = 0
+        for tile in reversed(range(self.length)):
+            at = tuple(self.position - self.direction * tile)
+            field[at] = self.ID
+            self.body.append((at, self.length - tile))
+
+    def update(self, field):
+        """ Ages the body by one tick, the tail segments which have run out of their lifetime leave the field """
+        self._tick += 1
+        while self.body and self.body[0][1] <= self._tick:
+            field[self.body.popleft()[0]] = 0
+
+    def place(self, field):
+        """ Puts the head to the field, where it stays for as many ticks as the current length """
+        at = tuple(self.position)
+        field[at] = self.ID
+        self.body.append((at, self._tick + self.length))
+
+    def grow(self):
+        """ Increases the length, and extends the lifetime of the head accordingly """
+        self.length += 1
+        self.body[-1] = (self.body[-1][0], self._tick + self.length)
 
     def change_direction(self):
-        if self.turn_queue and (direction := self.turn_queue.pop(0)) != -self.direction:
-            self.direction = direction
-
-    def move(self):
+        """ Takes the next turn of the queue, self.applied is the time of its input if the snake has turned """
+        self.applied = None
+        if self.turn_queue:
+            direction, stamp = self.turn_queue.pop(0)
+            if direction != -self.direction:
+                self.direction = direction
+                self.applied = stamp
+
+    def move(self, field):
+        """ Moves the head, the old head is marked on the field, as it is not drawn as the head anymore """
+        field.mark(self.position)
         self.position = self.position + self.direction
         self.heading = Vector(self.direction)
 
-    def turn(self, direction):
-        self.turn_queue.append(direction)
+    def turn(self, direction, stamp: float = None):
+        """
+        Queues a turn for the next ticks, only the last two turns are kept
+        :param stamp: time of the input, which is carried through the queue for latency measurements
+        """
+        self.turn_queue.append((direction, stamp))
         if len(self.turn_queue) > 2:
             del self.turn_queue[0]
 
-    @staticmethod
-    def delay(speed):
-        start, end, high, low = SETTINGS.SPEED_MAPPING
-        multiply = (low/high) ** (1.0/(end-start))
-        return high * multiply ** (speed-start)
-
 
 class Apple:
 
     ID = -1
 
-    def __init__(self):
+    def __init__(self, rng: Random = None):
+        self.rng = Random() if rng is None else rng
         self.position = Vector(0, 0)
+        self.placed = False
 
     def repos(self, field):
-        empty = [at for value, at in field if value == 0]
-        self.position = Vector(choice(empty))
-        field[self.position] = self.ID
+        """ Moves to a random empty cell, self.placed is False if there was none """
+        self.placed = (at := field.random_free(self.rng)) is not None
+        if self.placed:
+            self.position = Vector(at)
+            field[self.position] = self.ID
 
 
 class Bonus(Apple):
 
     ID = -2
-
-    def __init__(self, lifetime, clock):
-        super().__init__()
-        self._animation_timer = Timer(clock, 120)
-        self._lifetime_timer = Timer(clock, lifetime)
+    BLINK = 120  # ms
+
+    def __init__(self, lifetime, scheduler: Scheduler, rng: Random = None):
+        super().__init__(rng)
+        self._scheduler = scheduler
+        self._lifetime = lifetime
+        self._expiry = self._blink = None
+        self._field = None
         self._active = False
         self._animation_state = True
 
-    def update(self, framework):
-        if self._lifetime_timer():
-            self.deactivate(framework)
-            framework.field[self.position] = 0
-        if self.active and self._animation_timer():
-            self._animation_state = not self._animation_state
-            framework.field[self.position] = self.ID - int(self._animation_state)
-        framework.bonus_timer_label.update_text(round(self._lifetime_timer.countdown(), 1))
+    def expire(self):
+        self.deactivate()
+        self._field[self.position] = 0
 
-    def update_lifetime(self, delay):
-        delay = delay * (LAYOUT.FIELD_SIZE[0] + LAYOUT.FIELD_SIZE[1])
-        self._lifetime_timer.set(delay)
+    def blink(self):
+        self._animation_state = not self._animation_state
+        self._field[self.position] = self.ID - int(self._animation_state)
 
-    def activate(self, framework):
-        self._active = True
-        self.repos(framework.field)
-        self._lifetime_timer.start()
-        self._animation_timer.start()
+    def update_lifetime(self, delay, size):
+        self._lifetime = delay * (size[0] + size[1])
 
-        framework.interface.activate(framework.bonus_group)
+    def activate(self, field):
+        self._field = field
+        self.repos(field)
+        if not self.placed:
+            return
+        self._active = True
+        self._animation_state = True
+        self._expiry = self._scheduler.after(self._lifetime, self.expire)
+        self._blink = self._scheduler.after(self.BLINK, self.blink, self.BLINK)
 
-    def deactivate(self, framework):
+    def deactivate(self):
         self._active = False
-        self._lifetime_timer.stop()
-        self._animation_timer.stop()
-
-        framework.interface.deactivate(framework.bonus_group)
+        for timer in (self._expiry, self._blink):
+            if timer is not None:
+                timer.cancel()
 
     @property
     def active(self):
         return self._active
 
-    def freeze(self):
-        self._lifetime_timer.freeze()
-        self._animation_timer.freeze()
+    def countdown(self) -> float:
+        """ :returns: remaining lifetime in seconds """
+        return 0.0 if self._expiry is None else self._expiry.remaining()
@@ -1,7 +1,5 @@
-from random import random
-
-from source.engine.settings import SETTINGS, KEYS, LAYOUT
-from source.engine.state_machine import State
+from source.engine.settings import SETTINGS, KEYS, PATH
+from source.engine.state_machine import State, Transition
 from source.engine.tools import Direction
 from source.engine.events import EventHandler
 
@@ -22,159 +20,135 @@ class States:
 
 class Intro(State):
 
+    DURATION = 0  # ms
+    TRANSITIONS = {
+        "done": (Transition.SWITCH, States.MENU),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.INTRO, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.state_timer():
-            return States.MENU
-
     def entry_actions(self):
-        self.state_machine.state_timer.start()
+        self.state_machine.scheduler.after(self.DURATION, self.finish)
+
+    def finish(self):
+        """ The intro lasts until the startup of the framework has finished too """
+        self.state_machine.when_ready(lambda: self.state_machine.dispatch("done"))
 
 
 class Menu(State):
     """
     Start pressed -> Start
-    Settings pressed -> Settings
-    Key config pressed -> KeyConfig
-    High scores pressed -> HighScores
+    Settings pressed -> Settings (pushed)
+    Key config pressed -> KeyConfig (pushed)
+    High scores pressed -> HighScores (pushed)
     Exit pressed OR escape key pressed -> Outro
     """
 
+    TRANSITIONS = {
+        "start_button": (Transition.SWITCH, States.START),
+        "settings_button": (Transition.PUSH, States.SETTINGS),
+        "key_config_button": (Transition.PUSH, States.KEY_CONFIG),
+        "high_scores_button": (Transition.PUSH, States.HIGH_SCORES),
+        "exit_button": (Transition.SWITCH, States.OUTRO),
+        "EXIT": (Transition.SWITCH, States.OUTRO),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.MENU, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.start_button.pressed:
-            return States.START
-        if self.state_machine.settings_button.pressed:
-            return States.SETTINGS
-        if self.state_machine.key_config_button.pressed:
-            return States.KEY_CONFIG
-        if self.state_machine.high_scores_button.pressed:
-            return States.HIGH_SCORES
-        if self.state_machine.event_handler[KEYS.EXIT, "press"] or self.state_machine.exit_button.pressed:
-            return States.OUTRO
-
     def entry_actions(self):
         self.state_machine.reset()
-        self.state_machine.interface.activate(self.state_machine.menu_group)
-        self.state_machine.interface.activate(self.state_machine.start_group)
+        self.uncover_actions()
+
+    def uncover_actions(self):
+        """ Returning from a pushed state does not reset the game, the panel shows the settings of the next one """
+        self.state_machine.speed_value_label.update_text(SETTINGS.STARTING_SPEED)
+        self.state_machine.walls_value_label.update_text("ON" if SETTINGS.WALLS else "OFF")
+        self.state_machine.interface.activate(self.state_machine.group("Menu"))
+        self.state_machine.interface.activate(self.state_machine.group("Start"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.menu_group)
-        self.state_machine.interface.deactivate(self.state_machine.start_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Menu"))
+        self.state_machine.interface.deactivate(self.state_machine.group("Start"))
 
 
 class Start(State):
     """
-    Direction key pressed -> Game
+    Any key pressed -> Game
     """
 
+    TRANSITIONS = {
+        "any key": (Transition.SWITCH, States.GAME),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.START, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.event_handler["any"]:
-            return States.GAME
-
     def entry_actions(self):
         self.state_machine.reset()
-        self.state_machine.interface.activate(self.state_machine.start_game_group)
+        self.state_machine.event_handler.flush()
+        self.state_machine.interface.activate(self.state_machine.group("Start game"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.start_game_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Start game"))
 
     def render(self, display):
-        self.state_machine.field.render(display, self.state_machine.snake)
+        self.state_machine.sim.field.render(display, self.state_machine.sim.snake)
 
 
 class Game(State):
     """
-    p key or escape pressed -> Paused
+    p key or escape pressed -> Paused (pushed)
     lose condition -> GameOver
     lose condition with high score -> NewHighScore
     """
 
+    TRANSITIONS = {
+        "PAUSE": (Transition.PUSH, States.PAUSED),
+        "EXIT": (Transition.PUSH, States.PAUSED),
+        "game over": (Transition.SWITCH, States.GAME_OVER),
+        "new high score": (Transition.SWITCH, States.NEW_HIGH_SCORE),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.GAME, state_machine)
-        self._game_over = False
-
-    def check_conditions(self):
-        if self.state_machine.event_handler[KEYS.PAUSE, "press"] or \
-                self.state_machine.event_handler[KEYS.EXIT, "press"]:
-            return States.PAUSED
-        if self._game_over:
-            high_score = False
-            if high_score:
-                return States.NEW_HIGH_SCORE
-            else:
-                return States.GAME_OVER
 
     def entry_actions(self):
-        self._game_over = False
-        self.state_machine.loop_timer()
-
-    def events(self, event_handler):
-        if event_handler[KEYS.UP, "press"]:
-            self.state_machine.snake.turn(Direction.UP)
-        if event_handler[KEYS.DOWN, "press"]:
-            self.state_machine.snake.turn(Direction.DOWN)
-        if event_handler[KEYS.LEFT, "press"]:
-            self.state_machine.snake.turn(Direction.LEFT)
-        if event_handler[KEYS.RIGHT, "press"]:
-            self.state_machine.snake.turn(Direction.RIGHT)
-
-    def logic(self):
-
-        self.state_machine.snake.change_direction()
-        p = self.state_machine.snake.next_position
-
-        if self.state_machine.walls and not (LAYOUT.FIELD_SIZE[0] > p.x >= 0 and LAYOUT.FIELD_SIZE[1] > p.y >= 0):
-            self._game_over = True
-            return
-
-        self.state_machine.field.update()
-        self.state_machine.bonus.update(self.state_machine)
-
-        self.state_machine.snake.move()
-
-        if self.state_machine.snake.position.x >= LAYOUT.FIELD_SIZE[0]:
-            self.state_machine.snake.position.x = 0
-        if self.state_machine.snake.position.x < 0:
-            self.state_machine.snake.position.x = LAYOUT.FIELD_SIZE[0] - 1
-        if self.state_machine.snake.position.y >= LAYOUT.FIELD_SIZE[1]:
-            self.state_machine.snake.position.y = 0
-        if self.state_machine.snake.position.y < 0:
-            self.state_machine.snake.position.y = LAYOUT.FIELD_SIZE[1] - 1
-
-        if self.state_machine.field[self.state_machine.snake.position] > 0:
-            self._game_over = True
+        self.state_machine.game_step.reset()
 
-        self.state_machine.field[self.state_machine.snake.position] = self.state_machine.snake.length
+    def wake_in(self):
+        return 0
 
-        score_multiplier = SETTINGS.SPEED_MAPPING[1] - SETTINGS.SPEED_MAPPING[0] + self.state_machine.speed
-
-        if self.state_machine.snake.position == self.state_machine.apple.position:
-            self.state_machine.apple.repos(self.state_machine.field)
-            self.state_machine.snake.length += 1
-            self.state_machine.snake.stats["apple"] += 1
-            self.state_machine.score += SETTINGS.APPLE_SCORE * score_multiplier
-            self.state_machine.field[self.state_machine.snake.position] = self.state_machine.snake.length
-            if not self.state_machine.bonus.active and random() < SETTINGS.BONUS_CHANCE:
-                self.state_machine.bonus.activate(self.state_machine)
-        if self.state_machine.bonus.active and self.state_machine.snake.position == self.state_machine.bonus.position:
-            self.state_machine.bonus.deactivate(self.state_machine)
-            self.state_machine.score += SETTINGS.BONUS_SCORE * score_multiplier
-            self.state_machine.snake.stats["bonus"] += 1
+    def logic(self):
+        """ Turns are taken from the event queue in the order of the key presses, up to the time of the step """
+        sim = self.state_machine.sim
+        directions = {KEYS.UP: Direction.UP, KEYS.DOWN: Direction.DOWN, KEYS.LEFT: Direction.LEFT,
+                      KEYS.RIGHT: Direction.RIGHT}
+        for event in self.state_machine.event_handler.pop(self.state_machine.step_time):
+            if event.kind == "press" and event.code in directions:
+                sim.turn(directions[event.code], event.time)
+        sim.step()
+        if sim.snake.applied is not None:
+            self.state_machine.latency.simulated(sim.snake.applied)
+        if sim.game_over:
+            self.state_machine.dispatch("game over")
+
+        interface, bonus_group = self.state_machine.interface, self.state_machine.bonus_group
+        if sim.bonus.active != interface.active(bonus_group):
+            if sim.bonus.active:
+                interface.activate(bonus_group)
+            else:
+                interface.deactivate(bonus_group)
+        if sim.bonus.active:
+            self.state_machine.bonus_timer_label.update_text(round(sim.bonus.countdown(), 1))
 
-        self.state_machine.score_value_label.update_text(str(self.state_machine.score))
-        self.state_machine.apple_stat_label.update_text(str(self.state_machine.snake.stats["apple"]))
-        self.state_machine.bonus_stat_label.update_text(str(self.state_machine.snake.stats["bonus"]))
+        self.state_machine.score_value_label.update_text(str(sim.score))
+        self.state_machine.apple_stat_label.update_text(str(sim.snake.stats["apple"]))
+        self.state_machine.bonus_stat_label.update_text(str(sim.snake.stats["bonus"]))
 
     def render(self, display):
-        self.state_machine.field.render(display, self.state_machine.snake)
+        self.state_machine.sim.field.render(display, self.state_machine.sim.snake)
 
 
 class GameOver(State):
@@ -183,24 +157,26 @@ class GameOver(State):
     Menu pressed -> Menu
     """
 
+    TRANSITIONS = {
+        "game_over_restart_button": (Transition.SWITCH, States.START),
+        "game_over_menu_button": (Transition.SWITCH, States.MENU),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.GAME_OVER, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.game_over_restart_button.pressed:
-            return States.START
-        if self.state_machine.game_over_menu_button.pressed:
-            return States.MENU
-
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.game_over_group)
+        self.state_machine.replay.finish(self.state_machine.sim)
+        self.state_machine.replay.save(PATH.REPLAY)
+        self.state_machine.interface.activate(self.state_machine.group("Game over"))
+        self.state_machine.game_over_label.update_text("You won" if self.state_machine.sim.won else "Game over")
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.game_over_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Game over"))
 
     def render(self, display):
-        self.state_machine.field.render(display, self.state_machine.snake)
-        self.state_machine.field.fade_content(display)
+        self.state_machine.sim.field.render(display, self.state_machine.sim.snake)
+        self.state_machine.sim.field.fade_content(display)
 
 
 class NewHighScore(State):
@@ -209,76 +185,69 @@ class NewHighScore(State):
     Menu pressed -> Menu
     """
 
+    TRANSITIONS = GameOver.TRANSITIONS
+
     def __init__(self, state_machine):
         super().__init__(States.NEW_HIGH_SCORE, state_machine)
 
-    def check_conditions(self):
-        pass
-
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.game_over_group)
+        self.state_machine.interface.activate(self.state_machine.group("Game over"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.game_over_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Game over"))
 
     def render(self, display):
-        self.state_machine.field.render(display, self.state_machine.snake)
-        self.state_machine.field.fade_content(display)
+        self.state_machine.sim.field.render(display, self.state_machine.sim.snake)
+        self.state_machine.sim.field.fade_content(display)
 
 
 class Paused(State):
     """
-    Continue pressed -> Game
+    Continue pressed OR p key OR escape pressed -> Game (popped)
     Restart pressed -> Start
-    Settings pressed -> Settings
-    Key config pressed -> KeyConfig
-    High scores pressed -> HighScores
-    Exit pressed OR escape key pressed -> Outro
+    Settings pressed -> Settings (pushed)
+    Key config pressed -> KeyConfig (pushed)
+    High scores pressed -> HighScores (pushed)
+    Exit pressed -> Outro
     """
 
+    TRANSITIONS = {
+        "continue_button": (Transition.POP, None),
+        "PAUSE": (Transition.POP, None),
+        "EXIT": (Transition.POP, None),
+        "restart_button": (Transition.RESET, States.START),
+        "settings_button": (Transition.PUSH, States.SETTINGS),
+        "key_config_button": (Transition.PUSH, States.KEY_CONFIG),
+        "high_scores_button": (Transition.PUSH, States.HIGH_SCORES),
+        "exit_button": (Transition.RESET, States.OUTRO),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.PAUSED, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.event_handler[KEYS.PAUSE, "press"] or self.state_machine.continue_button.pressed or \
-                self.state_machine.event_handler[KEYS.EXIT, "press"]:
-            return States.GAME
-        if self.state_machine.restart_button.pressed:
-            return States.START
-        if self.state_machine.settings_button.pressed:
-            return States.SETTINGS
-        if self.state_machine.key_config_button.pressed:
-            return States.KEY_CONFIG
-        if self.state_machine.high_scores_button.pressed:
-            return States.HIGH_SCORES
-        if self.state_machine.exit_button.pressed:
-            return States.OUTRO
-
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.menu_group)
-        self.state_machine.interface.activate(self.state_machine.resume_group)
+        self.state_machine.interface.activate(self.state_machine.group("Menu"))
+        self.state_machine.interface.activate(self.state_machine.group("Resume"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.menu_group)
-        self.state_machine.interface.deactivate(self.state_machine.resume_group)
-
-    def events(self, event_handler):
-        self.state_machine.bonus.freeze()
+        self.state_machine.event_handler.flush()
+        self.state_machine.interface.deactivate(self.state_machine.group("Menu"))
+        self.state_machine.interface.deactivate(self.state_machine.group("Resume"))
 
     def render(self, display):
-        self.state_machine.field.render(display, self.state_machine.snake)
-        self.state_machine.field.fade_content(display)
+        self.state_machine.sim.field.render(display, self.state_machine.sim.snake)
+        self.state_machine.sim.field.fade_content(display)
 
 
 class Settings(State):
 
+    TRANSITIONS = {
+        "settings_return_button": (Transition.POP, None),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.SETTINGS, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.settings_return_button.pressed:
-            return self.state_machine.last_state
-
     def events(self, _):
         if self.state_machine.wall_switch.switched:
             SETTINGS.WALLS = self.state_machine.wall_switch.state
@@ -286,49 +255,49 @@ class Settings(State):
             SETTINGS.STARTING_SPEED = round(self.state_machine.starting_speed_slider.mapped)
 
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.settings_group)
+        self.state_machine.interface.activate(self.state_machine.group("Settings"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.settings_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Settings"))
 
 
 class KeyConfig(State):
 
+    TRANSITIONS = {
+        "key_config_return_button": (Transition.POP, None),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.KEY_CONFIG, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.key_config_return_button.pressed:
-            return self.state_machine.last_state
-
     def events(self, _):
         if self.state_machine.reset_keys_button.pressed:
             for key, switch in self.state_machine.key_config_switches.items():
                 switch.set_key(KEYS.DEFAULT[key])
 
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.key_config_group)
+        self.state_machine.interface.activate(self.state_machine.group("Key config"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.key_config_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("Key config"))
         for key, switch in self.state_machine.key_config_switches.items():
             setattr(KEYS, key, switch.key_code)
 
 
 class Leaderboard(State):
 
+    TRANSITIONS = {
+        "high_scores_return_button": (Transition.POP, None),
+    }
+
     def __init__(self, state_machine):
         super().__init__(States.HIGH_SCORES, state_machine)
 
-    def check_conditions(self):
-        if self.state_machine.high_scores_return_button.pressed:
-            return self.state_machine.last_state
-
     def entry_actions(self):
-        self.state_machine.interface.activate(self.state_machine.high_scores_group)
+        self.state_machine.interface.activate(self.state_machine.group("High scores"))
 
     def exit_actions(self):
-        self.state_machine.interface.deactivate(self.state_machine.high_scores_group)
+        self.state_machine.interface.deactivate(self.state_machine.group("High scores"))
 
 
 class Outro(State):
@@ -339,8 +308,5 @@ class Outro(State):
     def __init__(self, state_machine):
         super().__init__(States.OUTRO, state_machine)
 
-    def check_conditions(self):
-        pass
-
     def entry_actions(self):
         self.state_machine.running = False
@@ -0,0 +1,162 @@
+"""
+Compact binary replays: a game is stored as its seed, its settings and the stream of turns.
+
+File layout (every number is an unsigned LEB128 varint):
+    MAGIC, VERSION, seed, width, height, speed, walls, ticks, number of inputs,
+    and for each input: (ticks since the previous input << 2) | index of the direction in Direction.ALL
+"""
+
+from bisect import bisect_left
+from copy import deepcopy
+from typing import List, Tuple
+
+from source.engine.settings import WRITER
+from source.engine.tools import Vector, Direction
+from source.game.simulation import SnakeSim
+
+
+MAGIC = b"SNKR"
+VERSION = 2  # 2: bonus lifetime is exactly (width + height) ticks on the nanosecond clock
+
+
+def write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """ :returns: the value, and the offset after it """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Replay:
+
+    """ Seed, settings and turns of a game, which are enough to simulate it again exactly """
+
+    def __init__(self, seed: int, size: (int, int), speed: int, walls: bool, inputs: List[Tuple[int, int]] = None,
+                 ticks: int = 0):
+        """
+        :param inputs: (tick, direction index) pairs, the turn is queued before the given tick is simulated
+        :param ticks: length of the game
+        """
+        self.seed = seed
+        self.size = tuple(size)
+        self.speed = speed
+        self.walls = walls
+        self.inputs = [] if inputs is None else inputs
+        self.ticks = ticks
+
+    @classmethod
+    def record(cls, sim: SnakeSim, seed: int, speed: int = None, walls: bool = None) -> "Replay":
+        """ Starts a new game on the simulation with the given seed, and records its turns from now on """
+        sim.reset(speed, walls, seed)
+        replay = cls(seed, sim.field.size, sim.speed, sim.walls)
+        sim.recorder = replay
+        return replay
+
+    def record_turn(self, tick: int, direction: Vector):
+        """ Called by the recorded simulation for every turn """
+        self.inputs.append((tick, Direction.ALL.index(direction)))
+        self.ticks = max(self.ticks, tick)
+
+    def finish(self, sim: SnakeSim):
+        """ Stops recording the simulation """
+        self.ticks = sim.ticks
+        sim.recorder = None
+
+    def start(self) -> SnakeSim:
+        """ :returns: a new simulation in the state of the first tick of the game """
+        sim = SnakeSim(self.size)
+        sim.reset(self.speed, self.walls, self.seed)
+        return sim
+
+    def play(self, sim: SnakeSim, until: int):
+        """ Simulates the game without rendering, from the current tick of the simulation until the given tick """
+        directions, inputs = Direction.ALL, self.inputs
+        index = bisect_left(inputs, (sim.ticks, 0))
+        while sim.ticks < until and not sim.game_over:
+            while index < len(inputs) and inputs[index][0] == sim.ticks:
+                sim.turn(directions[inputs[index][1]])
+                index += 1
+            sim.step()
+
+    def encode(self) -> bytes:
+        out = bytearray(MAGIC)
+        for value in (VERSION, self.seed, *self.size, self.speed, int(self.walls), self.ticks, len(self.inputs)):
+            write_varint(out, value)
+
+        last = 0
+        for tick, direction in self.inputs:
+            write_varint(out, (tick - last) << 2 | direction)
+            last = tick
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Replay":
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a replay file")
+
+        offset, values = len(MAGIC), []
+        for _ in range(8):
+            value, offset = read_varint(data, offset)
+            values.append(value)
+        version, seed, width, height, speed, walls, ticks, count = values
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version: {version}")
+
+        inputs, tick = [], 0
+        for _ in range(count):
+            value, offset = read_varint(data, offset)
+            tick += value >> 2
+            inputs.append((tick, value & 3))
+        return cls(seed, (width, height), speed, bool(walls), inputs, ticks)
+
+    def save(self, path: str):
+        """ Queues the replay to be written by the background writer, call WRITER.flush() to wait for it """
+        WRITER.write(path, self.encode())
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        with open(path, "rb") as FILE:
+            return cls.decode(FILE.read())
+
+
+class Player:
+
+    """
+    Plays back a replay at full speed without rendering. The state of the game is copied at every `interval` ticks
+    the first time it is passed (keyframes), so seeking later only simulates from the closest keyframe.
+    """
+
+    def __init__(self, replay: Replay, interval: int = 500):
+        self.replay = replay
+        self.interval = interval
+        self._keyframes = {0: replay.start()}
+
+    def seek(self, tick: int) -> SnakeSim:
+        """ :returns: a new simulation in the state before the given tick is simulated """
+        tick = min(max(tick, 0), self.replay.ticks)
+        start = max(key for key in self._keyframes if key <= tick)
+        sim = deepcopy(self._keyframes[start])
+
+        for keyframe in range(start + self.interval, tick + 1, self.interval):
+            self.replay.play(sim, keyframe)
+            if sim.ticks < keyframe:
+                break
+            self._keyframes[keyframe] = deepcopy(sim)
+
+        self.replay.play(sim, tick)
+        return sim
+
+    def end(self) -> SnakeSim:
+        """ :returns: the simulation at the end of the game """
+        return self.seek(self.replay.ticks)
@@ -0,0 +1,137 @@
+from random import Random
+
+from source.engine.clock import SimClock, Scheduler
+from source.engine.settings import SETTINGS, LAYOUT, config
+from source.engine.tools import Vector
+from source.game.game_objects import Field, Snake, Apple, Bonus
+
+
+class SnakeSim:
+
+    """
+    Rules of the game without any display or window system dependencies.
+    The simulation has its own clock, which moves forward with the delay of the current speed in every step, so it
+    runs as fast as it is stepped, and the Bonus timers still behave as in a real game.
+    All the game objects share the random generator of the simulation, so a game is reproducible from its seed.
+    """
+
+    def __init__(self, size: (int, int) = None, pos: (int, int) = None, seed=None):
+        self.config = config()
+        self.clock = SimClock()
+        self.scheduler = Scheduler(self.clock)
+        self.rng = Random(seed)
+
+        self.field = Field(LAYOUT.FIELD_POS if pos is None else pos, LAYOUT.FIELD_SIZE if size is None else size,
+                           self.rng)
+        self.snake = Snake(self.field, self.rng)
+        self.apple = Apple(self.rng)
+        self.apple.repos(self.field)
+        self.bonus = Bonus(0, self.scheduler, self.rng)
+
+        self.score = 0
+        self.speed = SETTINGS.STARTING_SPEED
+        self.walls = SETTINGS.WALLS
+        self.won = False
+        self.game_over = False
+        self.cause = None
+        self.ticks = 0
+        self.recorder = None
+
+        self.bonus.update_lifetime(self.delay, self.field.size)
+
+    def reset(self, speed: int = None, walls: bool = None, seed=None):
+        """ Starts a new game, with the starting speed and walls of the settings unless they are given """
+        if seed is not None:
+            self.rng.seed(seed)
+
+        self.clock.reset()
+        self.scheduler.clear()
+        self.field.clear()
+        self.snake.reset(self.field)
+        self.apple.repos(self.field)
+        self.bonus.deactivate()
+
+        self.score = 0
+        self.speed = SETTINGS.STARTING_SPEED if speed is None else speed
+        self.walls = SETTINGS.WALLS if walls is None else walls
+        self.won = False
+        self.game_over = False
+        self.cause = None
+        self.ticks = 0
+
+        self.bonus.update_lifetime(self.delay, self.field.size)
+
+    @property
+    def delay(self) -> float:
+        """ :returns: time of one tick in milliseconds at the current speed """
+        return self.config.delays[self.speed - self.config.min_speed]
+
+    @property
+    def score_multiplier(self) -> int:
+        return self.config.score_multipliers[self.speed - self.config.min_speed]
+
+    def turn(self, direction: Vector, stamp: float = None):
+        """
+        Queues a turn of the snake, and passes it to the recorder (see Replay) if there is one
+        :param stamp: time of the input, see Snake.turn
+        """
+        if self.recorder is not None:
+            self.recorder.record_turn(self.ticks, direction)
+        self.snake.turn(direction, stamp)
+
+    def step(self, direction: Vector = None) -> (int, bool):
+        """
+        Advances the game by one tick
+        :param direction: turn of the snake to be queued before the tick
+        :returns: score gained in the tick, and whether the game is over
+        """
+        if self.game_over:
+            return 0, True
+        if direction is not None:
+            self.turn(direction)
+
+        score = self.score
+        self.clock.advance(self.delay)
+        self.ticks += 1
+        self.tick()
+        return self.score - score, self.game_over
+
+    def tick(self):
+        field, snake, apple, bonus = self.field, self.snake, self.apple, self.bonus
+        width, height = field.size
+
+        snake.change_direction()
+        p = snake.next_position
+
+        if self.walls and not (width > p.x >= 0 and height > p.y >= 0):
+            self.game_over, self.cause = True, "wall"
+            return
+
+        snake.update(field)
+        self.scheduler.run()
+
+        snake.move(field)
+        snake.position.x %= width
+        snake.position.y %= height
+
+        if field[snake.position] > 0:
+            self.game_over, self.cause = True, "body"
+
+        snake.place(field)
+        if not apple.placed:
+            apple.repos(field)  # no cell was empty when the apple was last eaten
+
+        if apple.placed and snake.position == apple.position:
+            apple.repos(field)
+            snake.grow()
+            snake.stats["apple"] += 1
+            self.score += self.config.apple_score * self.score_multiplier
+            if field.count(snake.ID) == width * height:
+                self.won = self.game_over = True
+                self.cause = "won"
+            if not bonus.active and self.rng.random() < self.config.bonus_chance:
+                bonus.activate(field)
+        if bonus.active and snake.position == bonus.position:
+            bonus.deactivate()
+            self.score += self.config.bonus_score * self.score_multiplier
+            snake.stats["bonus"] += 1